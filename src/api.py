@@ -0,0 +1,160 @@
+"""
+JSON API for generating, analyzing and exporting quizzes without the UI,
+mounted next to the Gradio app by server.py:
+
+    POST /api/generate   one quiz
+    POST /api/analyze    key terms, named entities and topics of a text
+    POST /api/export     questions as a csv, md, pdf or txt file
+    POST /api/bulk       a quiz for each of many documents, streamed back
+                         as NDJSON (one line per document, as each finishes)
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
+
+from phases import executors, metrics
+from phases.quizzes import Quiz
+from phases.scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+# Documents of one bulk request generated at once
+BULK_CONCURRENCY = int(os.getenv("QUIZ_API_BULK_CONCURRENCY", "8"))
+
+# Most documents accepted in one bulk request
+BULK_MAX_DOCUMENTS = int(os.getenv("QUIZ_API_BULK_MAX_DOCUMENTS", "500"))
+
+# Fields of a quiz state returned by the API
+QUIZ_FIELDS = ['questions', 'num_questions', 'question_types', 'difficulty', 'markdown_result']
+
+router = APIRouter(prefix="/api")
+quiz = Quiz()
+
+
+class QuizSettings(BaseModel):
+    gen_type: Literal['text', 'ai'] = 'text'
+    num_questions: int = Field(5, ge=1, le=50)
+    question_types: List[str] = ['mcq', 'fill_blank', 't/f', 'short_answer']
+    difficulty: str = 'medium'
+    use_cache: bool = True
+
+
+class GenerateRequest(QuizSettings):
+    text: str
+
+
+class AnalyzeRequest(BaseModel):
+    text: str
+
+
+class ExportRequest(BaseModel):
+    questions: List[dict]
+    file_type: Literal['csv', 'md', 'pdf', 'txt'] = 'md'
+    markdown: Optional[str] = None
+
+
+class BulkDocument(BaseModel):
+    id: Optional[str] = None
+    text: str
+
+
+class BulkRequest(QuizSettings):
+    """Settings shared by every document"""
+    documents: List[BulkDocument] = Field(min_length=1, max_length=BULK_MAX_DOCUMENTS)
+
+
+async def _create(settings: QuizSettings, text: str, priority: int) -> dict:
+    state = await quiz.acreate(settings.gen_type, text, settings.num_questions, settings.question_types,
+                               settings.difficulty, use_cache=settings.use_cache, priority=priority)
+    return {field: state[field] for field in QUIZ_FIELDS}
+
+
+def _analyze(text: str) -> dict:
+    """Analysis of text as plain data (run on the CPU pool)"""
+    document, markdown = quiz.analysis_report(text)
+    return {
+        'keywords': document.keywords,
+        'entities': document.entities,
+        'topics': document.get_topics(n_topics=3),
+        'markdown': markdown,
+    }
+
+
+@router.post("/generate")
+async def generate(request: GenerateRequest):
+    with metrics.request("api.generate", gen_type=request.gen_type) as log:
+        try:
+            result = await _create(request, request.text, PRIORITY_INTERACTIVE)
+        except ValueError as e:
+            log.status = 'invalid'
+            raise HTTPException(status_code=422, detail=str(e))
+    return jsonable_encoder(result)
+
+
+@router.post("/analyze")
+async def analyze(request: AnalyzeRequest):
+    if not request.text.strip():
+        raise HTTPException(status_code=422, detail="Please provide text to analyze.")
+    with metrics.request("api.analyze"):
+        result = await asyncio.to_thread(executors.run_cpu, _analyze, request.text)
+    return jsonable_encoder(result)
+
+
+@router.post("/export")
+async def export(request: ExportRequest):
+    if not request.questions:
+        raise HTTPException(status_code=422, detail="No questions to export.")
+
+    directory = tempfile.mkdtemp(prefix="quiz_api_")
+    try:
+        with metrics.request("api.export", file_type=request.file_type):
+            if request.file_type == "pdf":
+                # ReportLab layout is CPU-bound, so PDFs are built on the process pool
+                filename = await asyncio.to_thread(executors.run_cpu, quiz.export, request.questions,
+                                                   request.file_type, directory, request.markdown)
+            else:
+                filename = await asyncio.to_thread(quiz.export, request.questions, request.file_type,
+                                                   directory, request.markdown)
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    # The folder is removed once the file has been sent
+    return FileResponse(filename, filename=os.path.basename(filename),
+                        background=BackgroundTask(shutil.rmtree, directory, ignore_errors=True))
+
+
+async def _bulk_lines(request: BulkRequest):
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+    async def run(index: int, document: BulkDocument) -> dict:
+        line = {'index': index, 'id': document.id}
+        async with semaphore:
+            # Bulk AI requests wait behind interactive ones in the LLM scheduler
+            with metrics.request("api.bulk", gen_type=request.gen_type) as log:
+                try:
+                    return {**line, 'status': 'ok', **await _create(request, document.text, PRIORITY_BATCH)}
+                except Exception as e:
+                    log.status = 'error'
+                    return {**line, 'status': 'error', 'error': str(e)}
+
+    tasks = [asyncio.create_task(run(index, document)) for index, document in enumerate(request.documents)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield json.dumps(await finished, ensure_ascii=False, default=str) + "\n"
+    finally:
+        # A client that disconnects stops the documents not yet started
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/bulk")
+async def bulk(request: BulkRequest):
+    return StreamingResponse(_bulk_lines(request), media_type="application/x-ndjson")
@@ -1,8 +1,22 @@
-import gradio as gr
-from inputs import text_tab
-from inputs import file_tab
-from inputs import explanation_tab
-from inputs import terminal_tab
+from phases import startup
+
+with startup.timed("gradio", "import"):
+    import gradio as gr
+
+with startup.timed("inputs", "import"):
+    from inputs import text_tab
+    from inputs import file_tab
+    from inputs import explanation_tab
+    from inputs import terminal_tab
+
+from phases import algorithms, distractors, executors, jobs, preprocessing
+
+# Heavy NLP dependencies load in the background once the UI is built
+startup.register(preprocessing.NLTK_DATA_TASK, preprocessing.ensure_nltk_data)
+startup.register(algorithms.NER_MODEL_TASK, algorithms.get_nlp)
+startup.register(algorithms.NLP_LIBRARIES_TASK, algorithms.import_nlp_libraries)
+if distractors.VECTORS_PATH:
+    startup.register(distractors.VECTORS_TASK, distractors.get_distractor_index)
 
 # -------- GLOBAL CSS (affects root HTML, not internal components) --------
 global_css = """
@@ -95,7 +109,11 @@ setTimeout(applyCustomStyles, 600);
 </script>
 """
 
-with gr.Blocks(title="Automatic Quiz Generator") as demo:
+def refresh_readiness():
+    # Stop polling once every model has loaded (or failed)
+    return startup.readiness_markdown(), gr.Timer(active=startup.is_loading())
+
+with startup.timed("UI", "build"), gr.Blocks(title="Automatic Quiz Generator") as demo:
 
     gr.HTML(f"<style>{global_css}</style>")
     gr.HTML(shadow_dom_css)
@@ -104,6 +122,9 @@ with gr.Blocks(title="Automatic Quiz Generator") as demo:
         # Automatic Quiz Generator  
         Enter text or upload a file to generate custom quizzes using AI.
     """)
+    readiness = gr.Markdown(startup.readiness_markdown)
+    readiness_timer = gr.Timer(2)
+    readiness_timer.tick(refresh_readiness, outputs=[readiness, readiness_timer])
 
     with gr.Tabs():
         text_tab.render()
@@ -111,5 +132,14 @@ with gr.Blocks(title="Automatic Quiz Generator") as demo:
         explanation_tab.render()
         terminal_tab.render()
 
+# CPU-bound and LLM events set their own limits (see phases.executors)
+demo.queue(default_concurrency_limit=executors.DEFAULT_EVENT_CONCURRENCY)
+
+startup.start_warm_up()
+
 if __name__ == "__main__":
+    # Background jobs interrupted by the last shutdown are run again; done at
+    # launch rather than import, so importing the app has no side effects
+    # (server.py does it when it starts serving)
+    jobs.job_queue.resume()
     demo.launch(theme=gr.themes.Soft(), share=True)
@@ -0,0 +1,104 @@
+"""
+Load test of the "Generate with AI" path.
+
+Runs many quizzes concurrently through Quiz.generate (or generate_stream)
+and reports throughput and latency percentiles. Uses the offline fake
+backend unless QUIZ_LLM_BACKEND says otherwise, so it runs without network:
+
+    cd src
+    python -m benchmarks.llm_load --requests 200 --concurrency 16
+    QUIZ_LLM_FAKE_FAILURE_RATE=0.1 python -m benchmarks.llm_load --stream
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Must be set before phases.llm_backends reads its settings; the response
+# cache is kept in memory so benchmark runs don't fill the real one. Rate
+# limits are off unless QUIZ_LLM_RPM / QUIZ_LLM_TPM are set for the run.
+os.environ.setdefault("QUIZ_LLM_BACKEND", "fake")
+os.environ.setdefault("QUIZ_LLM_CACHE_PATH", ":memory:")
+os.environ.setdefault("QUIZ_LLM_RPM", "0")
+os.environ.setdefault("QUIZ_LLM_TPM", "0")
+
+import numpy as np
+
+from phases import llm_backends, llm_client, tokens
+from phases.quizzes import Quiz, new_quiz_state
+
+EXAMPLE_TEXT = os.path.join(os.path.dirname(__file__), "..", "examples", "input_text.txt")
+
+
+def run_one(text, args):
+    """One quiz request; returns (seconds, seconds to first question, failed)"""
+    quiz = Quiz()
+    start = time.perf_counter()
+    first = None
+
+    if args.stream:
+        outputs = None
+        for outputs in quiz.generate_stream(new_quiz_state(), "ai", text, args.questions, args.types, args.difficulty,
+                                            use_cache=args.cache):
+            if first is None:
+                first = time.perf_counter() - start
+    else:
+        outputs = quiz.generate(new_quiz_state(), "ai", text, args.questions, args.types, args.difficulty, use_cache=args.cache)
+
+    elapsed = time.perf_counter() - start
+    failed = isinstance(outputs[2], str) and outputs[2].startswith("**Error")
+    return elapsed, first if first is not None else elapsed, failed
+
+
+def percentiles(values):
+    if not values:
+        return "n/a"
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return f"p50 {p50:.3f}s  p90 {p90:.3f}s  p99 {p99:.3f}s  max {max(values):.3f}s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="quizzes to generate")
+    parser.add_argument("--concurrency", type=int, default=8, help="quizzes in flight at once")
+    parser.add_argument("--text", default=EXAMPLE_TEXT, help="source material file")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=["mcq", "fill_blank", "t/f", "short_answer"])
+    parser.add_argument("--difficulty", default="medium")
+    parser.add_argument("--stream", action="store_true", help="use the streaming path and report time to first question")
+    parser.add_argument("--cache", action="store_true", help="allow LLM response cache hits")
+    parser.add_argument("--vary", action="store_true", help="make every request's text unique")
+    args = parser.parse_args(argv)
+
+    with open(args.text, "r", encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+
+    backend = llm_backends.get_backend()
+    print(f"Backend: {backend.name}, {args.requests} requests, concurrency {args.concurrency}, "
+          f"{'streaming' if args.stream else 'non-streaming'}")
+
+    texts = [f"{text}\n\nRequest {i}." if args.vary else text for i in range(args.requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda t: run_one(t, args), texts))
+    wall = time.perf_counter() - start
+
+    latencies = [r[0] for r in results if not r[2]]
+    first_questions = [r[1] for r in results if not r[2]]
+    failures = sum(r[2] for r in results)
+
+    print(f"Wall time:    {wall:.2f}s")
+    print(f"Throughput:   {len(results) / wall:.2f} quizzes/s")
+    print(f"Failures:     {failures} of {len(results)}")
+    print(f"Latency:      {percentiles(latencies)}")
+    if args.stream:
+        print(f"First question: {percentiles(first_questions)}")
+    print(f"Token usage:  {tokens.usage.stats()}")
+    print(f"LLM cache:    {llm_client.response_cache.stats()}")
+    print(f"Scheduler:    {llm_client.scheduler.stats()}")
+    return 1 if failures == len(results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Compare the CPU runtimes of the flan-t5 explanation model.
+
+Every runtime is measured in its own process, so that resident memory
+reflects only that variant:
+
+    cd src
+    python -m benchmarks.t5_runtime --runtimes torch int8 onnx --threads 4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+QUESTIONS = [
+    "1. What gas do plants absorb during photosynthesis?\na) Oxygen\nb) Carbon dioxide (*)\nc) Nitrogen\nd) Helium",
+    "2. Which organelle contains chlorophyll?\na) Nucleus\nb) Mitochondria\nc) Chloroplast (*)\nd) Ribosome",
+    "3. What is the main product of photosynthesis?\na) Glucose (*)\nb) Protein\nc) Salt\nd) Water",
+    "4. Which light colors does chlorophyll absorb best?\na) Green and yellow\nb) Blue and red (*)\nc) Infrared\nd) Ultraviolet",
+]
+
+
+def measure(runtime, rounds, batch_size):
+    """Load one runtime and time batched explanations; runs in a worker process"""
+    from phases.quiz_generator import QuizAI
+
+    quiz_ai = QuizAI(runtime=runtime)
+    start = time.perf_counter()
+    quiz_ai.load()
+    load_seconds = time.perf_counter() - start
+
+    # One warm-up pass so lazy initialization isn't timed
+    quiz_ai.explain_questions(QUESTIONS[:1], batch_size=1)
+
+    single_tokens = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for question in QUESTIONS:
+            explanation = quiz_ai.explain_questions([question], batch_size=1)[0]
+            single_tokens += len(quiz_ai.tokenizer(explanation)["input_ids"])
+    single_seconds = time.perf_counter() - start
+
+    batched_tokens = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for explanation in quiz_ai.explain_questions(QUESTIONS, batch_size=batch_size):
+            batched_tokens += len(quiz_ai.tokenizer(explanation)["input_ids"])
+    batched_seconds = time.perf_counter() - start
+
+    return {
+        "runtime": quiz_ai.runtime,
+        "load_seconds": load_seconds,
+        "tokens_per_second": single_tokens / single_seconds,
+        "batched_tokens_per_second": batched_tokens / batched_seconds,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runtimes", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the sample questions")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.rounds, args.batch_size)))
+        return 0
+
+    env = dict(os.environ, QUIZ_TORCH_THREADS=str(args.threads), QUIZ_WARM_UP="0")
+    src_dir = os.path.join(os.path.dirname(__file__), "..")
+
+    print(f"{'runtime':<8} {'load s':>8} {'tok/s':>8} {'batched tok/s':>14} {'peak RSS MB':>12}")
+    for runtime in args.runtimes:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.t5_runtime", "--worker", runtime,
+             "--rounds", str(args.rounds), "--batch-size", str(args.batch_size)],
+            cwd=src_dir, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            print(f"{runtime:<8} failed: {result.stderr.strip().splitlines()[-1:]}")
+            continue
+
+        row = json.loads(result.stdout.strip().splitlines()[-1])
+        label = row["runtime"] if row["runtime"] == runtime else f"{runtime}->{row['runtime']}"
+        print(f"{label:<8} {row['load_seconds']:8.2f} {row['tokens_per_second']:8.1f} "
+              f"{row['batched_tokens_per_second']:14.1f} {row['peak_rss_mb']:12.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,11 @@
 import gradio as gr
-from phases.quiz_generator import QuizAI   
+from phases import executors, startup
+from phases.quiz_generator import QuizAI, MODEL_TASK
 
 def render():
+    # The model loads on the background warm-up thread, not while building the UI
     quiz_ai = QuizAI()
+    startup.register(MODEL_TASK, quiz_ai.load)
 
     def process_document(file):
         if file is None:
@@ -11,10 +14,10 @@ def render():
         return msg, quiz_ai.detect_material()
     
 
-    def explain_answer(quiz_text):
+    def explain_answer(quiz_text, explain_all):
         if not quiz_text.strip():
             return "No quiz text found. Generate questions first."
-        return quiz_ai.generate_explanations(quiz_text)
+        return quiz_ai.generate_explanations(quiz_text, explain_all=explain_all)
 
     with gr.Tab("Generate Quiz with Explanations"):
 
@@ -31,12 +34,21 @@ def render():
 
         quiz_btn = gr.Button("Generate Quiz")
         quiz_output = gr.Textbox(label="Generated Quiz", lines=12)
-        quiz_btn.click(quiz_ai.generate_quiz, outputs=quiz_output)
+        # flan-t5 runs in this process and competes for the cores with the CPU pool
+        quiz_btn.click(
+            quiz_ai.generate_quiz,
+            outputs=quiz_output,
+            concurrency_limit=executors.CPU_EVENT_CONCURRENCY,
+            concurrency_id=executors.CPU_EVENTS
+        )
 
+        explain_all_checkbox = gr.Checkbox(label="Explain every question", value=False)
         explain_btn = gr.Button("Explain Answer")
         explanation_output = gr.Textbox(label="Explanation", lines=8)
         explain_btn.click(
             explain_answer,
-            inputs=quiz_output,
-            outputs=explanation_output
+            inputs=[quiz_output, explain_all_checkbox],
+            outputs=explanation_output,
+            concurrency_limit=executors.CPU_EVENT_CONCURRENCY,
+            concurrency_id=executors.CPU_EVENTS
         )
\ No newline at end of file
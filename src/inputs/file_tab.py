@@ -1,7 +1,11 @@
-﻿import gradio as gr
-from phases.quizzes import Quiz
+﻿import asyncio
+import gradio as gr
+from phases import executors
+from phases.jobs import DONE, FAILED, job_queue
+from phases.quizzes import SESSION_TTL, Quiz, discard_quiz_state, new_quiz_state
 
 def render():
+    # Shared by every session; each session's quiz lives in quiz_state
     quiz = Quiz()
     
     with gr.Tab("Upload .txt file"):
@@ -33,11 +37,22 @@ def render():
                     ["easy", "medium", "hard"],
                     label="Difficulty",
                 )
+                use_cache_checkbox = gr.Checkbox(
+                    value=True,
+                    label="Reuse cached AI responses",
+                    info="Uncheck to ask the model again for the same input"
+                )
 
                 with gr.Row():
                     generate_button = gr.Button("Generate", variant="primary")
                     llm_button = gr.Button("✨ Generate with AI",variant="primary")
                     shuffle_button = gr.Button("Shuffle", variant="secondary")
+                with gr.Row():
+                    job_id_input = gr.Textbox(
+                        label="Job ID",
+                        info="Generation keeps running if you close the tab; paste its ID to get the quiz back"
+                    )
+                    fetch_button = gr.Button("Fetch job", variant="secondary")
             
             with gr.Column():
                 text_output = gr.Markdown(label="Generated Quiz")
@@ -46,28 +61,81 @@ def render():
                     download_button = gr.DownloadButton("Download", visible=False)
                     analyze_button = gr.Button("Analyze", visible=False, variant="secondary")
 
+        quiz_state = gr.State(new_quiz_state, time_to_live=SESSION_TTL, delete_callback=discard_quiz_state)
+
+        async def watch_job(state, job_id, progress):
+            """Outputs for a background job: progress while it runs, then its quiz"""
+            async for job in job_queue.watch(job_id):
+                if job is None:
+                    yield (*quiz.show_error(state, f"No job with ID {job_id}, or its result has expired."), job_id)
+                elif job['status'] == DONE:
+                    yield (*quiz.show_result(state, job['result']), job_id)
+                elif job['status'] == FAILED:
+                    yield (*quiz.show_error(state, f"**Error generating questions:** {job['error']}"), job_id)
+                else:
+                    progress(job['progress'], desc=job['stage'] or job['status'])
+
+        # Local generation of a large upload can take a while, so it runs as a background job
+        async def generate_in_background(state, file, num_q, q_types, diff, progress=gr.Progress()):
+            upload, error = await asyncio.to_thread(quiz.read_upload, file)
+            if error:
+                yield (*quiz.show_error(state, error), "")
+                return
 
+            job_id = job_queue.submit("text", upload['text'], num_q, q_types, diff, sentences=upload['sentences'])
+            yield (*quiz.show_error(state, f"Generating in the background, job ID `{job_id}`"), job_id)
+            async for outputs in watch_job(state, job_id, progress):
+                yield outputs
+
+        async def fetch_job(state, job_id, progress=gr.Progress()):
+            if not job_id or not job_id.strip():
+                yield (*quiz.show_error(state, "Please enter a job ID."), job_id)
+                return
+            async for outputs in watch_job(state, job_id.strip(), progress):
+                yield outputs
+
+        # An async generator, so Gradio shows each question as it streams in
+        # without holding a worker thread while waiting on the LLM
+        async def generate_with_ai(state, file, num_q, q_types, diff, use_cache):
+            async for outputs in quiz.aget_text_from_file_stream(state, file, num_q, q_types, diff, use_cache):
+                yield outputs
+
+        # These only wait on the job store; the job's own work is limited by the job queue
         generate_button.click(
-            fn=lambda file, num_q, q_types, diff: quiz.get_text_from_file(file, "text", num_q, q_types, diff),
-            inputs=[file_input, num_questions, question_types, difficulty_radio],
-            outputs=[download_button, analyze_button, text_output]
+            fn=generate_in_background,
+            inputs=[quiz_state, file_input, num_questions, question_types, difficulty_radio],
+            outputs=[download_button, analyze_button, text_output, quiz_state, job_id_input],
+            concurrency_limit=None
+        )
+        fetch_button.click(
+            fn=fetch_job,
+            inputs=[quiz_state, job_id_input],
+            outputs=[download_button, analyze_button, text_output, quiz_state, job_id_input],
+            concurrency_limit=None
         )
         llm_button.click(
-            fn=lambda file, num_q, q_types, diff: quiz.get_text_from_file(file, "ai", num_q, q_types, diff),
-            inputs=[file_input, num_questions, question_types, difficulty_radio], 
-            outputs=[download_button, analyze_button, text_output]
+            fn=generate_with_ai,
+            inputs=[quiz_state, file_input, num_questions, question_types, difficulty_radio, use_cache_checkbox], 
+            outputs=[download_button, analyze_button, text_output, quiz_state],
+            concurrency_limit=executors.LLM_EVENT_CONCURRENCY,
+            concurrency_id=executors.LLM_EVENTS
         )
         shuffle_button.click(
             fn=quiz.shuffle,
-            inputs=[],
-            outputs=[download_button, analyze_button, text_output]
+            inputs=[quiz_state],
+            outputs=[download_button, analyze_button, text_output, quiz_state]
         )
         download_button.click(
             fn=quiz.download,
-            inputs=[file_type_radio],
-            outputs=[download_button, text_output]
+            inputs=[quiz_state, file_type_radio],
+            outputs=[download_button, text_output, quiz_state],
+            concurrency_limit=executors.CPU_EVENT_CONCURRENCY,
+            concurrency_id=executors.CPU_EVENTS
         )
         analyze_button.click(
             fn=quiz.analyze,
-            outputs=[download_button, analyze_button, text_output]
+            inputs=[quiz_state],
+            outputs=[download_button, analyze_button, text_output, quiz_state],
+            concurrency_limit=executors.CPU_EVENT_CONCURRENCY,
+            concurrency_id=executors.CPU_EVENTS
         )
@@ -1,7 +1,9 @@
 ﻿import gradio as gr
-from phases.quizzes import Quiz
+from phases import executors
+from phases.quizzes import SESSION_TTL, Quiz, discard_quiz_state, new_quiz_state
 
 def render():
+    # Shared by every session; each session's quiz lives in quiz_state
     quiz = Quiz()
 
     with gr.Tab("Text (prompt)"):
@@ -33,6 +35,11 @@ def render():
                     ["easy", "medium", "hard"],
                     label="Difficulty",
                 )
+                use_cache_checkbox = gr.Checkbox(
+                    value=True,
+                    label="Reuse cached AI responses",
+                    info="Uncheck to ask the model again for the same input"
+                )
 
                 with gr.Row():
                     generate_button = gr.Button("Generate", variant="primary")
@@ -45,28 +52,45 @@ def render():
                 with gr.Row():
                     download_button = gr.DownloadButton("Download", visible=False)
                     analyze_button = gr.Button("Analyze", visible=False, variant="secondary")
+
+        quiz_state = gr.State(new_quiz_state, time_to_live=SESSION_TTL, delete_callback=discard_quiz_state)
         
+        # An async generator, so Gradio shows each question as it streams in
+        # without holding a worker thread while waiting on the LLM
+        async def generate_with_ai(state, text, num, types, difficulty, use_cache):
+            async for outputs in quiz.agenerate_stream(state, text, num, types, difficulty, use_cache=use_cache):
+                yield outputs
+
         generate_button.click(
-            fn=lambda text, num, types, difficulty: quiz.generate("text", text, num, types, difficulty),
-            inputs=[text_input, num_questions, question_types, difficulty_radio],
-            outputs=[download_button, analyze_button, text_output]
+            fn=lambda state, text, num, types, difficulty: quiz.generate(state, "text", text, num, types, difficulty),
+            inputs=[quiz_state, text_input, num_questions, question_types, difficulty_radio],
+            outputs=[download_button, analyze_button, text_output, quiz_state],
+            concurrency_limit=executors.CPU_EVENT_CONCURRENCY,
+            concurrency_id=executors.CPU_EVENTS
         )
         llm_button.click(
-            fn=lambda text, num, types, difficulty: quiz.generate("ai", text, num, types, difficulty),
-            inputs=[text_input, num_questions, question_types, difficulty_radio], 
-            outputs=[download_button, analyze_button, text_output]
+            fn=generate_with_ai,
+            inputs=[quiz_state, text_input, num_questions, question_types, difficulty_radio, use_cache_checkbox], 
+            outputs=[download_button, analyze_button, text_output, quiz_state],
+            concurrency_limit=executors.LLM_EVENT_CONCURRENCY,
+            concurrency_id=executors.LLM_EVENTS
         )
         shuffle_button.click(
             fn=quiz.shuffle,
-            inputs=[],
-            outputs=[download_button, analyze_button, text_output]
+            inputs=[quiz_state],
+            outputs=[download_button, analyze_button, text_output, quiz_state]
         )
         download_button.click(
             fn=quiz.download,
-            inputs=[file_type_radio],
-            outputs=[download_button, text_output]
+            inputs=[quiz_state, file_type_radio],
+            outputs=[download_button, text_output, quiz_state],
+            concurrency_limit=executors.CPU_EVENT_CONCURRENCY,
+            concurrency_id=executors.CPU_EVENTS
         )
         analyze_button.click(
             fn=quiz.analyze,
-            outputs=[download_button, analyze_button, text_output]
+            inputs=[quiz_state],
+            outputs=[download_button, analyze_button, text_output, quiz_state],
+            concurrency_limit=executors.CPU_EVENT_CONCURRENCY,
+            concurrency_id=executors.CPU_EVENTS
         )
\ No newline at end of file
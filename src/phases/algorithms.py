@@ -1,50 +1,132 @@
+import os
+import re
+import threading
 import numpy as np
-import nltk
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
-from gensim.models import Word2Vec
-from nltk.tokenize import word_tokenize
-import spacy
-
-from . import preprocessing
-
-try:
-    nlp = spacy.load("en_core_web_sm")
-except:
-    print("Please install spacy model: python -m spacy download en_core_web_sm")
-    nlp = None    
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-
-def extract_keywords_tfidf(text, top_n=10):
-    """Extract keywords using TF-IDF"""
-    sentences = preprocessing.preprocess_text(text)
-    
+
+from . import metrics, preprocessing, startup
+from .startup import lazy_import
+
+# spaCy, scikit-learn, gensim and NLTK are imported on first use (or by the
+# background warm-up) so that importing this module stays cheap.
+
+SPACY_MODEL = "en_core_web_sm"
+
+# Only entities are used, so skip every component NER doesn't depend on
+SPACY_EXCLUDE = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+# Large inputs are split into paragraph chunks of at most this many characters
+# and run through nlp.pipe with these settings
+SPACY_CHUNK_CHARS = int(os.getenv("QUIZ_SPACY_CHUNK_CHARS", "20000"))
+SPACY_BATCH_SIZE = int(os.getenv("QUIZ_SPACY_BATCH_SIZE", "4"))
+SPACY_N_PROCESS = int(os.getenv("QUIZ_SPACY_N_PROCESS", "1"))
+
+NER_MODEL_TASK = "spaCy NER"
+
+_nlp = None
+_nlp_loaded = False
+_nlp_lock = threading.Lock()
+
+def _load_ner_pipeline():
+    spacy = lazy_import("spacy")
+    with startup.timed(SPACY_MODEL, "model"):
+        nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+
+    # The shared tok2vec only feeds the tagger/parser in the core English models
+    if "tok2vec" in nlp.pipe_names and "ner" not in nlp.get_pipe("tok2vec").listening_components:
+        nlp.remove_pipe("tok2vec")
+    return nlp
+
+def get_nlp():
+    """NER pipeline, loaded once on first use. None if the spaCy model is not installed."""
+    global _nlp, _nlp_loaded
+
+    if not _nlp_loaded:
+        with _nlp_lock:
+            if not _nlp_loaded:
+                try:
+                    _nlp = _load_ner_pipeline()
+                    startup.mark_ready(NER_MODEL_TASK)
+                except Exception:
+                    print("Please install spacy model: python -m spacy download en_core_web_sm")
+                    _nlp = None
+                    startup.mark_failed(NER_MODEL_TASK, f"{SPACY_MODEL} not installed")
+                _nlp_loaded = True
+    return _nlp
+
+NLP_LIBRARIES_TASK = "NLP libraries"
+
+def import_nlp_libraries():
+    """Import scikit-learn and gensim ahead of the first request"""
+    for module_name in ["sklearn.feature_extraction.text", "sklearn.decomposition", "gensim.models"]:
+        lazy_import(module_name)
+    startup.mark_ready(NLP_LIBRARIES_TASK)
+
+# Vocabulary cap for TF-IDF/LDA models. Matrices stay sparse, so raising it
+# costs little memory.
+TFIDF_MAX_FEATURES = int(os.getenv("QUIZ_TFIDF_MAX_FEATURES", "100"))
+
+# Topic model used for analysis and topic questions (see topics.TopicModel):
+# 'lda' or the faster 'nmf'
+TOPIC_BACKEND = os.getenv("QUIZ_TOPIC_BACKEND", "lda")
+
+def top_k_indices(scores, k):
+    """Indices of the k largest scores, highest first, without a full sort"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=int)
+
+    top = np.argpartition(scores, -k)[-k:]
+    return top[np.argsort(scores[top])[::-1]]
+
+
+@metrics.timed("algorithms.build_tfidf")
+def build_tfidf(sentences, max_features=None):
+    """Fit a TF-IDF model over sentences, returns (vectorizer, sparse matrix)"""
     if len(sentences) < 2:
-        return []
-    
-    vectorizer = TfidfVectorizer(max_features=100, stop_words='english')
+        return None, None
+
+    TfidfVectorizer = lazy_import("sklearn.feature_extraction.text").TfidfVectorizer
+    vectorizer = TfidfVectorizer(max_features=max_features or TFIDF_MAX_FEATURES, stop_words='english')
     tfidf_matrix = vectorizer.fit_transform(sentences)
+    return vectorizer, tfidf_matrix
+
+@metrics.timed("algorithms.rank_keywords")
+def rank_keywords(vectorizer, tfidf_matrix, top_n=10):
+    """Rank vocabulary terms of a fitted TF-IDF model by average score"""
+    if vectorizer is None:
+        return []
+
     feature_names = vectorizer.get_feature_names_out()
     
-    # Get average TF-IDF scores
-    avg_scores = np.mean(tfidf_matrix.toarray(), axis=0)
-    top_indices = avg_scores.argsort()[-top_n:][::-1]
+    # Get average TF-IDF scores (sparse column means, no dense copy)
+    avg_scores = np.asarray(tfidf_matrix.mean(axis=0)).ravel()
+    top_indices = top_k_indices(avg_scores, top_n)
     
     keywords = [feature_names[i] for i in top_indices]
     return keywords
 
-def extract_topics_lda(text, n_topics=3):
+@metrics.timed("algorithms.extract_keywords_tfidf")
+def extract_keywords_tfidf(text, top_n=10, sentences=None, max_features=None):
+    """Extract keywords using TF-IDF"""
+    if sentences is None:
+        sentences = preprocessing.preprocess_text(text)
+
+    vectorizer, tfidf_matrix = build_tfidf(sentences, max_features=max_features)
+    return rank_keywords(vectorizer, tfidf_matrix, top_n=top_n)
+
+@metrics.timed("algorithms.extract_topics_lda")
+def extract_topics_lda(text, n_topics=3, sentences=None):
     """Extract topics using LDA"""
-    sentences = preprocessing.preprocess_text(text)
+    if sentences is None:
+        sentences = preprocessing.preprocess_text(text)
     
     if len(sentences) < 2:
         return []
     
-    vectorizer = TfidfVectorizer(max_features=100, stop_words='english')
+    TfidfVectorizer = lazy_import("sklearn.feature_extraction.text").TfidfVectorizer
+    LatentDirichletAllocation = lazy_import("sklearn.decomposition").LatentDirichletAllocation
+
+    vectorizer = TfidfVectorizer(max_features=TFIDF_MAX_FEATURES, stop_words='english')
     doc_term_matrix = vectorizer.fit_transform(sentences)
     
     lda = LatentDirichletAllocation(n_components=min(n_topics, len(sentences)), 
@@ -55,33 +137,86 @@ def extract_topics_lda(text, n_topics=3):
     topics = []
     
     for topic_idx, topic in enumerate(lda.components_):
-        top_indices = topic.argsort()[-5:][::-1]
+        top_indices = top_k_indices(topic, 5)
         topic_words = [feature_names[i] for i in top_indices]
         topics.append(topic_words)
     
     return topics
 
-def extract_entities_ner(text):
-    """Extract named entities using spaCy"""
+def split_into_chunks(text, max_chars=None):
+    """Group paragraphs into chunks of at most max_chars characters"""
+    max_chars = max_chars or SPACY_CHUNK_CHARS
+    chunks = []
+    current = ""
+
+    for paragraph in re.split(r'\n\s*\n', text):
+        # Paragraphs longer than a chunk are split on whitespace
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+@metrics.timed("algorithms.parse_documents")
+def parse_documents(text):
+    """
+    Run the NER pipeline over text in paragraph chunks.
+    Returns a list of spaCy Docs, or None when spaCy is unavailable.
+    """
+    nlp = get_nlp()
     if nlp is None:
+        return None
+
+    chunks = split_into_chunks(text)
+    if len(chunks) <= 1:
+        return [nlp(chunk) for chunk in chunks]
+
+    return list(nlp.pipe(
+        chunks,
+        batch_size=SPACY_BATCH_SIZE,
+        n_process=max(1, min(SPACY_N_PROCESS, len(chunks)))
+    ))
+
+@metrics.timed("algorithms.extract_entities_ner")
+def extract_entities_ner(text, docs=None):
+    """Extract named entities using spaCy"""
+    if docs is None:
+        docs = parse_documents(text)
+
+    if docs is None:
         return []
     
-    doc = nlp(text)
     entities = []
     
-    for ent in doc.ents:
-        if ent.label_ in ['PERSON', 'ORG', 'GPE', 'DATE', 'EVENT', 'PRODUCT']:
-            entities.append({
-                'text': ent.text,
-                'label': ent.label_
-            })
+    for doc in docs:
+        for ent in doc.ents:
+            if ent.label_ in ['PERSON', 'ORG', 'GPE', 'DATE', 'EVENT', 'PRODUCT']:
+                entities.append({
+                    'text': ent.text,
+                    'label': ent.label_
+                })
     
     return entities
 
-def train_word_embeddings(text):
+@metrics.timed("algorithms.train_word_embeddings")
+def train_word_embeddings(text, sentences=None):
     """Train Word2Vec embeddings"""
-    sentences = preprocessing.preprocess_text(text)
-    tokenized = [word_tokenize(s.lower()) for s in sentences]
+    if sentences is None:
+        sentences = preprocessing.preprocess_text(text)
+    tokenized = [preprocessing.tokenize_words(s.lower()) for s in sentences]
 
     # Filter out stopwords and short words
     stop_words = preprocessing.get_stop_words()
@@ -91,6 +226,51 @@ def train_word_embeddings(text):
     if len(tokenized) < 2:
         return None
     
+    Word2Vec = lazy_import("gensim.models").Word2Vec
     model = Word2Vec(sentences=tokenized, vector_size=50, window=5, 
                     min_count=1, workers=2, seed=42)
-    return model
\ No newline at end of file
+    return model
+
+# Trade-off between relevance and novelty when selecting sentences: 0 ranks
+# by relevance alone, 1 by dissimilarity to what is already selected alone
+MMR_DIVERSITY = 0.3
+
+# Sentences at least this similar to a selected one count as repeats
+MMR_DUPLICATE_SIMILARITY = 0.95
+
+@metrics.timed("algorithms.select_sentences_mmr")
+def select_sentences_mmr(sentences, costs, budget, diversity=MMR_DIVERSITY, max_features=None):
+    """
+    Greedy maximal marginal relevance selection: repeatedly pick the sentence
+    most similar to the whole document (TF-IDF centroid) and least similar to
+    the sentences already picked, as long as its cost fits in the budget.
+    Returns the selected indices in document order.
+    """
+    vectorizer, tfidf_matrix = build_tfidf(sentences, max_features=max_features)
+    if vectorizer is None:
+        return [i for i in range(len(sentences)) if costs[i] <= budget][:1]
+
+    # Rows are L2-normalized, so dot products are cosine similarities
+    centroid = np.asarray(tfidf_matrix.mean(axis=0)).ravel()
+    norm = np.linalg.norm(centroid)
+    relevance = tfidf_matrix @ (centroid / norm) if norm > 0 else np.zeros(len(sentences))
+
+    costs = np.asarray(costs, dtype=float)
+    available = costs <= budget
+    redundancy = np.zeros(len(sentences))
+    selected = []
+
+    while available.any():
+        scores = (1 - diversity) * relevance - diversity * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        budget -= costs[best]
+
+        # Similarity to the new pick, one sparse row product instead of a full n x n matrix
+        similarity = np.asarray((tfidf_matrix @ tfidf_matrix[best].T).todense()).ravel()
+        redundancy = np.maximum(redundancy, similarity)
+        available[best] = False
+        available &= (costs <= budget) & (redundancy < MMR_DUPLICATE_SIMILARITY)
+
+    return sorted(selected)
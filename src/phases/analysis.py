@@ -0,0 +1,172 @@
+import re
+from functools import cached_property, lru_cache
+
+from . import preprocessing, algorithms, topics
+from .cache import analysis_cache, make_key
+
+_WORD_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=4096)
+def keyword_pattern(keyword: str):
+    """Compiled case-insensitive whole-word pattern for a keyword"""
+    return re.compile(r'\b' + re.escape(keyword) + r'\b', re.IGNORECASE)
+
+
+class SentenceIndex:
+    """
+    Inverted index from lowercased word tokens to the ids of the sentences
+    containing them, built in a single tokenization pass.
+
+    Looking up a term intersects the posting lists of its tokens, so only
+    the few candidate sentences are checked against the term itself.
+    """
+
+    def __init__(self, sentences):
+        self.sentences = sentences
+        self._postings = {}
+        for i, sentence in enumerate(sentences):
+            for token in set(_WORD_RE.findall(sentence.lower())):
+                self._postings.setdefault(token, []).append(i)
+
+    def lookup(self, term: str, match_case: bool = False):
+        """
+        Ids of sentences containing term, in document order.
+        term must appear as whole words, ignoring case by default;
+        match_case=True also requires term's exact case.
+        """
+        tokens = set(_WORD_RE.findall(term.lower()))
+        if not tokens:
+            candidates = range(len(self.sentences))
+        else:
+            postings = sorted((self._postings.get(t, []) for t in tokens), key=len)
+            if not postings[0]:
+                return []
+            candidates = postings[0]
+            if len(postings) > 1:
+                candidates = sorted(set(candidates).intersection(*postings[1:]))
+
+        if match_case:
+            return [i for i in candidates if term in self.sentences[i]]
+
+        # A single word token is matched exactly by its posting list
+        if _WORD_RE.fullmatch(term) and len(tokens) == 1:
+            return list(candidates)
+
+        pattern = keyword_pattern(term)
+        return [i for i in candidates if pattern.search(self.sentences[i])]
+
+    def first(self, term: str, skip=(), match_case: bool = False):
+        """Id of the first sentence containing term that is not in skip, or None"""
+        for i in self.lookup(term, match_case=match_case):
+            if i not in skip:
+                return i
+        return None
+
+
+class DocumentAnalysis:
+    """
+    NLP artifacts for one input text, computed once and shared by every
+    question generator and by the quiz analysis.
+
+    Every artifact is computed on first access, so generators only pay for
+    what they actually use. Keywords, entities and topics also go
+    through the shared content-addressed analysis cache, so repeated clicks
+    on the same text skip the NLP work entirely.
+    """
+
+    def __init__(self, text: str, n_keywords: int = 20, sentences: list = None):
+        self.text = text
+        self.n_keywords = n_keywords
+        self._topics = {}
+
+        # Sentences already segmented while streaming an upload
+        if sentences is not None:
+            self.sentences = sentences
+
+    @cached_property
+    def sentences(self):
+        return preprocessing.preprocess_text(self.text)
+
+    @cached_property
+    def index(self):
+        """Keyword -> sentence lookup over self.sentences"""
+        return SentenceIndex(self.sentences)
+
+    @cached_property
+    def docs(self):
+        """spaCy Docs for the paragraph chunks of the text (None if spaCy is unavailable)"""
+        return algorithms.parse_documents(self.text)
+
+    @cached_property
+    def _tfidf(self):
+        return algorithms.build_tfidf(self.sentences)
+
+    @property
+    def vectorizer(self):
+        return self._tfidf[0]
+
+    @property
+    def tfidf_matrix(self):
+        return self._tfidf[1]
+
+    def _cached(self, kind, compute, should_cache=None, **params):
+        return analysis_cache.get_or_compute(make_key(kind, self.text, **params), compute, should_cache)
+
+    @cached_property
+    def keywords(self):
+        """Top keywords ranked by average TF-IDF score"""
+        return self._cached(
+            'keywords',
+            lambda: algorithms.rank_keywords(self.vectorizer, self.tfidf_matrix, top_n=self.n_keywords),
+            top_n=self.n_keywords,
+            max_features=algorithms.TFIDF_MAX_FEATURES,
+        )
+
+    @cached_property
+    def entities(self):
+        return self._cached(
+            'entities',
+            lambda: algorithms.extract_entities_ner(self.text, docs=self.docs),
+            # Don't cache empty results while the spaCy model is missing
+            should_cache=lambda _: algorithms.get_nlp() is not None,
+            model=algorithms.SPACY_MODEL,
+            chunk_chars=algorithms.SPACY_CHUNK_CHARS,
+        )
+
+    def get_topics(self, n_topics: int = 3):
+        """Topics from the shared incremental topic model, memoized per topic count"""
+        if n_topics not in self._topics:
+            self._topics[n_topics] = self._cached(
+                'topics',
+                lambda: topics.get_topic_model().text_topics(self.sentences, n_topics=n_topics),
+                n_topics=n_topics,
+                backend=algorithms.TOPIC_BACKEND,
+                model_topics=topics.TOPIC_MODEL_TOPICS,
+                features=topics.TOPIC_HASH_FEATURES,
+            )
+        return self._topics[n_topics]
+
+    @property
+    def topics(self):
+        return self.get_topics()
+
+    def prepare(self):
+        """
+        Compute everything the question generators read, so that generators
+        running in parallel share these results instead of racing to build them
+        """
+        self.sentences
+        self.index
+        self.keywords
+        self.entities
+        return self
+
+    def __getstate__(self):
+        # spaCy Docs and the TF-IDF matrix are the heavy part of an analysis and
+        # are not needed once keywords and entities exist, so they are left out
+        # when an analysis is sent to a worker process (and rebuilt on access)
+        state = self.__dict__.copy()
+        state.pop('docs', None)
+        state.pop('_tfidf', None)
+        return state
@@ -0,0 +1,271 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+# In-memory budget for cached analysis results, in bytes
+CACHE_MAX_BYTES = int(os.getenv("QUIZ_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# Optional on-disk tier that survives restarts, e.g. ~/.cache/quiz_generator
+CACHE_DIR = os.getenv("QUIZ_CACHE_DIR", "")
+CACHE_DISK_MAX_BYTES = int(os.getenv("QUIZ_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+def normalize_text(text: str) -> str:
+    """Normalize line endings and surrounding whitespace before hashing"""
+    return text.replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def make_key(kind: str, text: str, **params) -> str:
+    """Content-addressed cache key for a result of `kind` computed on text with params"""
+    digest = hashlib.sha256()
+    digest.update(kind.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(repr(sorted(params.items())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Two-tier cache for NLP results (keywords, entities, topics).
+
+    The memory tier is an LRU bounded by the pickled size of its values.
+    When disk_dir is set, values are also written there as pickle files and
+    loaded back on a memory miss, so results survive restarts.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, disk_dir: str = CACHE_DIR,
+                 disk_max_bytes: int = CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = os.path.expanduser(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._captured = None
+        self._drained_counters = {}
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # size of the disk tier, scanned on the first write
+        self._disk_lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+        }
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get_or_compute(self, key: str, compute, should_cache=None):
+        """
+        Return the cached value for key, calling compute() and storing its
+        result on a miss. should_cache(value) can veto storing a result.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return self._entries[key][0]
+
+        found, value, blob = self._read_disk(key)
+        if found:
+            with self._lock:
+                self._counters['disk_hits'] += 1
+            self._store(key, value, len(blob))
+            return value
+
+        with self._lock:
+            self._counters['misses'] += 1
+
+        value = compute()
+        if should_cache is not None and not should_cache(value):
+            return value
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Unpicklable results are returned but not cached
+            return value
+
+        self._store(key, value, len(blob))
+        self._write_disk(key, blob)
+        with self._lock:
+            if self._captured is not None:
+                self._captured.append((key, value, len(blob)))
+        return value
+
+    def _store(self, key, value, size):
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        # Called with self._lock held
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._counters['evictions'] += 1
+
+    def resize(self, max_bytes: int):
+        """Change the memory budget, evicting the least recently used entries to fit"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def capture(self):
+        """Start keeping every computed entry so drain() can hand them to another process"""
+        with self._lock:
+            self._captured = []
+            self._drained_counters = dict(self._counters)
+
+    def drain(self):
+        """(key, value, size) of the entries computed since the last drain (only while capturing)"""
+        with self._lock:
+            captured = self._captured or []
+            if self._captured is not None:
+                self._captured = []
+        return captured
+
+    def drain_counters(self) -> dict:
+        """Counter increments since capture() or the last call, for add_counters in another process"""
+        with self._lock:
+            counters = dict(self._counters)
+            deltas = {name: value - self._drained_counters.get(name, 0) for name, value in counters.items()}
+            self._drained_counters = counters
+        return deltas
+
+    def add_counters(self, deltas: dict):
+        """Count lookups made in another process (see drain_counters) in stats()"""
+        with self._lock:
+            for name, value in deltas.items():
+                self._counters[name] += value
+
+    def seed(self, entries):
+        """Add entries drained in another process to the memory tier"""
+        for key, value, size in entries:
+            self._store(key, value, size)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pkl")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return False, None, None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            value = pickle.loads(blob)
+        except FileNotFoundError:
+            return False, None, None
+        except Exception as e:
+            print(f"WARNING: Dropping unreadable cache file {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return False, None, None
+
+        # Refresh mtime so disk pruning keeps recently used entries
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, value, blob
+
+    def _write_disk(self, key, blob):
+        if not self.disk_dir:
+            return
+
+        path = self._disk_path(key)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"WARNING: Could not write cache file {path}: {e}")
+            return
+
+        # The tier's size is tracked as files are written, so the directory is
+        # only walked on the first write and when the budget is exceeded
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()[1]
+            else:
+                self._disk_bytes += len(blob) - replaced
+            if self._disk_bytes > self.disk_max_bytes:
+                self._disk_bytes = self._prune_disk()
+
+    def _scan_disk(self):
+        """(mtime, size, path) of every cache file, and their total size"""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return files, total
+
+    def _prune_disk(self) -> int:
+        """
+        Delete least recently used cache files once the disk tier exceeds its
+        budget, returns the tier's size afterwards. The size is rescanned,
+        which also picks up files written by other processes.
+        """
+        files, total = self._scan_disk()
+        if total <= self.disk_max_bytes:
+            return total
+
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.disk_max_bytes:
+                break
+        return total
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current memory usage"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drop the memory tier (the disk tier is left untouched)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Process-wide cache shared by every DocumentAnalysis
+analysis_cache = AnalysisCache()
@@ -0,0 +1,181 @@
+import os
+import re
+import sys
+import threading
+import numpy as np
+
+from . import algorithms, preprocessing, startup
+from .startup import lazy_import
+
+# Prebuilt word vectors used to pick MCQ distractors: either a gensim
+# KeyedVectors file (saved with kv.save) or a .npy matrix with a sibling
+# .vocab file holding one word per line. Both are memory-mapped read-only,
+# so worker processes share the pages instead of loading a copy each.
+VECTORS_PATH = os.getenv("QUIZ_DISTRACTOR_VECTORS", "")
+
+VECTORS_TASK = "distractor vectors"
+
+_WORD_RE = re.compile(r'\w+')
+
+# Distinct phrases remembered by DistractorIndex.most_similar
+MEMO_SIZE = 10000
+
+NORM_BLOCK_ROWS = 65536
+
+
+class DistractorIndex:
+    """
+    Read-only word vector store with batched top-k cosine search.
+    Multi-word phrases are embedded as the mean of their known word vectors.
+    """
+
+    def __init__(self, words, vectors):
+        self.words = list(words)
+        self.vectors = vectors
+        self._word_ids = {w: i for i, w in enumerate(self.words)}
+
+        # Row norms are kept instead of a normalized copy of a memory-mapped
+        # matrix, computed in blocks to avoid a full-size temporary
+        norms = np.empty(len(self.words), dtype=np.float32)
+        for start in range(0, len(norms), NORM_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + NORM_BLOCK_ROWS], dtype=np.float32)
+            norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+        norms[norms == 0] = 1.0
+        self._norms = norms
+
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str):
+        path = os.path.expanduser(path)
+        if path.endswith(".npy"):
+            vectors = np.load(path, mmap_mode='r')
+            with open(path[:-len(".npy")] + ".vocab", "r", encoding="utf-8") as f:
+                words = [line.rstrip("\n") for line in f]
+            if len(words) != vectors.shape[0]:
+                raise ValueError(f"{path}: {vectors.shape[0]} vectors but {len(words)} vocabulary words")
+            return cls(words, vectors)
+
+        KeyedVectors = lazy_import("gensim.models").KeyedVectors
+        kv = KeyedVectors.load(path, mmap='r')
+        return cls(kv.index_to_key, kv.vectors)
+
+    def _word_id(self, token):
+        word_id = self._word_ids.get(token)
+        if word_id is None:
+            word_id = self._word_ids.get(token.lower())
+        return word_id
+
+    def phrase_vector(self, phrase: str):
+        """Unit vector for a word or phrase, None if none of its words are known"""
+        ids = [self._word_id(t) for t in _WORD_RE.findall(phrase)]
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return None
+
+        vector = np.mean([self.vectors[i] / self._norms[i] for i in ids], axis=0)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def most_similar(self, phrases, top_n: int = 3) -> dict:
+        """
+        Nearest vocabulary words for every phrase, computed in one matrix product.
+        Returns {phrase: [word, ...]}; phrases with no known words map to [].
+        """
+        with self._lock:
+            results = {p: self._memo[p] for p in phrases if p in self._memo}
+
+        pending = [p for p in dict.fromkeys(phrases) if p not in results]
+        queries = [(p, self.phrase_vector(p)) for p in pending]
+        known = [(p, v) for p, v in queries if v is not None]
+        for p, v in queries:
+            if v is None:
+                results[p] = []
+
+        if known:
+            query_matrix = np.stack([v for _, v in known]).astype(np.float32)
+            scores = np.asarray(self.vectors @ query_matrix.T) / self._norms[:, None]
+            stop_words = preprocessing.get_stop_words()
+
+            for column, (phrase, _) in enumerate(known):
+                results[phrase] = self._pick(phrase, scores[:, column], top_n, stop_words)
+
+        with self._lock:
+            if len(self._memo) > MEMO_SIZE:
+                self._memo.clear()
+            self._memo.update({p: results[p] for p in pending})
+
+        return results
+
+    def _pick(self, phrase, scores, top_n, stop_words):
+        """Best-scoring words that are not stopwords or just a piece of the phrase itself"""
+        phrase_tokens = {t.lower() for t in _WORD_RE.findall(phrase)}
+        phrase_lower = phrase.lower()
+
+        # Over-fetch so that filtering out the phrase's own words still leaves top_n
+        candidates = algorithms.top_k_indices(scores, top_n + len(phrase_tokens) + 5)
+        picked = []
+        seen = set()
+        for i in candidates:
+            word = self.words[i]
+            key = word.lower()
+            if (key in phrase_tokens or key in seen or key in phrase_lower or key in stop_words
+                    or len(key) < 3 or not _WORD_RE.fullmatch(word)):
+                continue
+            seen.add(key)
+
+            # Match the capitalization of the answer so the distractor doesn't stand out
+            if phrase[:1].isupper():
+                word = word[:1].upper() + word[1:]
+            picked.append(word)
+            if len(picked) >= top_n:
+                break
+        return picked
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_distractor_index():
+    """Shared DistractorIndex, loaded on first use. None when no vectors are configured."""
+    global _index, _index_loaded
+
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                if VECTORS_PATH:
+                    try:
+                        with startup.timed(VECTORS_PATH, "model"):
+                            _index = DistractorIndex.load(VECTORS_PATH)
+                        startup.mark_ready(VECTORS_TASK)
+                    except Exception as e:
+                        print(f"WARNING: Could not load distractor vectors from {VECTORS_PATH}: {e}")
+                        startup.mark_failed(VECTORS_TASK, str(e))
+                _index_loaded = True
+    return _index
+
+
+def build_vectors(texts, path: str):
+    """Train Word2Vec on a corpus once and save its vectors for QUIZ_DISTRACTOR_VECTORS"""
+    model = algorithms.train_word_embeddings("\n".join(texts))
+    if model is None:
+        raise ValueError("Corpus is too small to train word vectors.")
+
+    model.wv.save(path)
+    return path
+
+
+if __name__ == "__main__":
+    # python -m phases.distractors OUTPUT.kv CORPUS.txt [CORPUS.txt ...]
+    if len(sys.argv) < 3:
+        print("Usage: python -m phases.distractors OUTPUT.kv CORPUS.txt [CORPUS.txt ...]")
+        sys.exit(1)
+
+    corpus = []
+    for corpus_path in sys.argv[2:]:
+        with open(corpus_path, "r", encoding="utf-8", errors="ignore") as f:
+            corpus.append(f.read())
+    print(f"Saved vectors to {build_vectors(corpus, sys.argv[1])}")
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from . import metrics, startup
+from .cache import CACHE_MAX_BYTES, analysis_cache
+
+# Worker processes for CPU-bound requests (local generation, PDF export);
+# 0 runs them on the calling thread instead
+CPU_WORKERS = int(os.getenv("QUIZ_CPU_WORKERS", str(os.cpu_count() or 1)))
+
+# Gradio concurrency groups. CPU-bound events share one limit matching the
+# process pool, so a burst of them queues instead of oversubscribing the
+# cores; LLM events mostly wait on the network and run on async handlers, so
+# many can be in flight without holding a worker thread each.
+CPU_EVENTS = "cpu"
+CPU_EVENT_CONCURRENCY = CPU_WORKERS or (os.cpu_count() or 1)
+LLM_EVENTS = "llm"
+LLM_EVENT_CONCURRENCY = int(os.getenv("QUIZ_LLM_EVENT_CONCURRENCY", "64"))
+
+# Limit of every other (cheap) event, e.g. shuffling or polling readiness
+DEFAULT_EVENT_CONCURRENCY = int(os.getenv("QUIZ_DEFAULT_EVENT_CONCURRENCY", "8"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_worker = False
+
+
+def _init_worker():
+    global _in_worker
+    _in_worker = True
+    # Metrics forked from the server are the server's; the worker's own go back with each result
+    metrics.registry.reset()
+    metrics.registry.capture()
+    # Workers share one analysis cache budget, and send what they compute (and
+    # their hit and miss counts) back to the server, whose cache serves Analyze
+    # and the requests run inline
+    analysis_cache.resize(CACHE_MAX_BYTES // max(CPU_WORKERS, 1))
+    analysis_cache.capture()
+
+
+def _call_in_worker(fn, args, kwargs):
+    result = fn(*args, **kwargs)
+    return result, metrics.registry.drain(), analysis_cache.drain(), analysis_cache.drain_counters()
+
+
+def in_cpu_worker() -> bool:
+    """True inside a CPU pool worker, where work must not fan out to further pools"""
+    return _in_worker
+
+
+def get_cpu_pool():
+    """Shared process pool for CPU-bound requests, None when disabled"""
+    global _pool
+
+    if CPU_WORKERS <= 0 or _in_worker:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # A fork during warm-up would copy a model loader's lock while it is
+            # held, deadlocking the workers on first use of that model
+            startup.wait_for_warm_up()
+            # fork shares the already loaded models and libraries with the workers
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            _pool = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=context, initializer=_init_worker)
+    return _pool
+
+
+def run_cpu(fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) on the CPU pool and wait for its result. fn, its
+    arguments and its result must be picklable. Runs inline when the pool is
+    disabled or when already inside a worker. Metrics recorded and analysis
+    results cached by the worker, and its cache's hit and miss counts, are
+    added to this process's registry and cache.
+    """
+    pool = get_cpu_pool()
+    if pool is None:
+        return fn(*args, **kwargs)
+    result, captured, cached, cache_counters = pool.submit(_call_in_worker, fn, args, kwargs).result()
+    metrics.registry.replay(captured)
+    analysis_cache.seed(cached)
+    analysis_cache.add_counters(cache_counters)
+    return result
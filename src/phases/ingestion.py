@@ -0,0 +1,178 @@
+import codecs
+import os
+import sys
+from typing import List, TypedDict
+
+from . import metrics, preprocessing
+
+# Size of each read from an uploaded file
+INGEST_CHUNK_BYTES = int(os.getenv("QUIZ_INGEST_CHUNK_BYTES", str(1024 * 1024)))
+
+# Only the first QUIZ_INGEST_MAX_CHARS characters (cut at a sentence
+# boundary) are kept for analysis; the rest of the file is never read
+INGEST_MAX_CHARS = int(os.getenv("QUIZ_INGEST_MAX_CHARS", str(2_000_000)))
+
+# Upper bound on the memory held by one ingestion (read buffer, pending
+# partial sentence, the kept window and its sentences)
+INGEST_MAX_MEMORY_BYTES = int(os.getenv("QUIZ_INGEST_MAX_MEMORY_BYTES", str(64 * 1024 * 1024)))
+
+# Characters before the unsearched end of the pending text that are segmented
+# again, so a sentence boundary split across two chunks is still found
+BOUNDARY_CONTEXT_CHARS = 256
+
+
+upload_bytes = metrics.registry.counter("quiz_upload_bytes_total", "Bytes read from uploaded files")
+upload_peak_memory = metrics.registry.histogram(
+    "quiz_upload_peak_memory_bytes", "Peak memory held while ingesting one upload",
+    buckets=tuple(4 ** n for n in range(8, 15)))
+
+
+class IngestLimitError(ValueError):
+    pass
+
+
+class IngestResult(TypedDict):
+    text: str
+    sentences: List[str]
+    bytes_read: int
+    truncated: bool
+    peak_memory_bytes: int
+
+
+def iter_decoded_chunks(source, chunk_bytes: int = INGEST_CHUNK_BYTES):
+    """
+    Read a path or file-like object in chunks and decode it incrementally as
+    UTF-8, yielding (text, bytes read) pairs. Invalid bytes are dropped.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="ignore")
+
+    if isinstance(source, (str, os.PathLike)):
+        f = open(source, "rb")
+        close = True
+    else:
+        f = source
+        close = False
+
+    try:
+        while True:
+            raw = f.read(chunk_bytes)
+            if not raw:
+                break
+            if isinstance(raw, str):
+                # Text-mode file objects are already decoded
+                yield raw, len(raw)
+            else:
+                yield decoder.decode(raw), len(raw)
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail, 0
+    finally:
+        if close:
+            f.close()
+
+
+@metrics.timed("ingestion")
+def ingest(source, max_chars: int = INGEST_MAX_CHARS, max_memory_bytes: int = INGEST_MAX_MEMORY_BYTES,
+           chunk_bytes: int = INGEST_CHUNK_BYTES) -> IngestResult:
+    """
+    Stream an upload into a bounded, sentence-aligned window of text.
+
+    Sentences are segmented as chunks arrive; only the trailing partial
+    sentence is carried over to the next chunk. Reading stops once the
+    window holds max_chars characters. Raises IngestLimitError if the memory
+    held at any point exceeds max_memory_bytes.
+    """
+    window = []         # complete text kept for analysis
+    sentences = []
+    sentences_bytes = 0
+    window_chars = 0
+    window_bytes = 0
+    pending = ""        # text after the last complete sentence
+    searched = 0        # length of pending already segmented without a boundary
+    bytes_read = 0
+    peak = 0
+    truncated = False
+
+    def check(held):
+        nonlocal peak
+        peak = max(peak, held)
+        if held > max_memory_bytes:
+            raise IngestLimitError(
+                f"Upload needs more than {max_memory_bytes} bytes of memory to ingest; "
+                f"raise QUIZ_INGEST_MAX_MEMORY_BYTES or lower QUIZ_INGEST_MAX_CHARS."
+            )
+
+    for chunk, raw_size in iter_decoded_chunks(source, chunk_bytes):
+        bytes_read += raw_size
+        pending += chunk
+
+        held = (raw_size + sys.getsizeof(pending) + window_bytes
+                + sys.getsizeof(sentences) + sentences_bytes)
+        check(held)
+
+        # Only the part of pending not segmented yet can hold a new boundary,
+        # so a long run of text without one is not segmented over and over
+        start = max(0, searched - BOUNDARY_CONTEXT_CHARS)
+        tail_sentences = preprocessing.preprocess_text(pending[start:])
+        check(held + sys.getsizeof(tail_sentences) + sum(map(sys.getsizeof, tail_sentences)))
+
+        cut = pending.rfind(tail_sentences[-1], start) if len(tail_sentences) >= 2 else -1
+        if cut <= start:
+            searched = len(pending)
+            if window_chars + len(pending) > max_chars:
+                # No sentence boundary before the window is full, cut mid-sentence
+                kept = pending[:max_chars - window_chars]
+                window.append(kept)
+                sentences.extend(preprocessing.preprocess_text(kept))
+                pending = ""
+                truncated = True
+                break
+            continue
+
+        # Everything before the last sentence is complete; the last one may
+        # continue in the next chunk
+        complete, pending = pending[:cut], pending[cut:]
+        searched = len(pending)
+        if start == 0:
+            complete_sentences = tail_sentences[:-1]
+        else:
+            # The search began inside the first sentence
+            complete_sentences = preprocessing.preprocess_text(complete)
+
+        if window_chars + len(complete) > max_chars:
+            # Keep whole sentences up to the limit and stop reading
+            end = 0
+            for sentence in complete_sentences:
+                start = complete.find(sentence, end)
+                if window_chars + start + len(sentence) > max_chars:
+                    break
+                end = start + len(sentence)
+                sentences.append(sentence)
+            window.append(complete[:end])
+            window_chars += end
+            pending = ""
+            truncated = True
+            break
+
+        window.append(complete)
+        sentences.extend(complete_sentences)
+        sentences_bytes += sum(map(sys.getsizeof, complete_sentences))
+        window_chars += len(complete)
+        window_bytes += sys.getsizeof(complete)
+
+    if pending.strip():
+        if window_chars + len(pending) <= max_chars:
+            window.append(pending)
+            sentences.extend(preprocessing.preprocess_text(pending))
+        else:
+            truncated = True
+
+    upload_bytes.inc(bytes_read)
+    upload_peak_memory.observe(peak)
+    return IngestResult(
+        text="".join(window),
+        sentences=sentences,
+        bytes_read=bytes_read,
+        truncated=truncated,
+        peak_memory_bytes=peak,
+    )
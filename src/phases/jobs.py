@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from . import executors, metrics
+from .quizzes import Quiz
+
+# SQLite file holding submitted generation jobs, their progress and results
+JOBS_PATH = os.getenv(
+    "QUIZ_JOBS_PATH",
+    os.path.join("~", ".cache", "quiz_generator", "jobs.sqlite3"),
+)
+
+# Seconds a finished job's result is kept
+JOBS_TTL = float(os.getenv("QUIZ_JOBS_TTL", str(7 * 24 * 3600)))
+
+# Jobs running at once; each one's NLP work goes to the CPU pool
+JOB_WORKERS = int(os.getenv("QUIZ_JOB_WORKERS", "2"))
+
+# Seconds between progress checks of a watched job
+JOB_POLL_INTERVAL = 0.5
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+jobs_resumed = metrics.registry.counter("quiz_jobs_resumed_total", "Unfinished jobs requeued after a restart")
+
+# Fields of a finished quiz state kept as the job's result
+RESULT_FIELDS = ['input_text', 'markdown_result', 'questions', 'num_questions', 'question_types', 'difficulty']
+
+
+class JobStore:
+    """
+    Generation jobs in SQLite: the request, the current stage and progress,
+    and the result or error. Every process (the server and each CPU pool
+    worker) opens its own connection, so workers report progress directly.
+    """
+
+    def __init__(self, path: str = JOBS_PATH, ttl: float = JOBS_TTL):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self._db = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # A copy sent to a worker process opens its own connection
+        return {'path': self.path, 'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _connect(self):
+        with self._lock:
+            if self._db is None:
+                if self.path != ":memory:":
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    " id TEXT PRIMARY KEY,"
+                    " status TEXT NOT NULL,"
+                    " stage TEXT,"
+                    " progress REAL NOT NULL DEFAULT 0,"
+                    " request TEXT NOT NULL,"
+                    " result TEXT,"
+                    " error TEXT,"
+                    " created REAL NOT NULL,"
+                    " updated REAL NOT NULL)"
+                )
+                self._db.commit()
+        return self._db
+
+    def _execute(self, sql: str, params=()):
+        db = self._connect()
+        with self._lock:
+            rows = db.execute(sql, params).fetchall()
+            db.commit()
+        return rows
+
+    def create(self, request: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, status, request, created, updated) VALUES (?, ?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(request, ensure_ascii=False), now, now),
+        )
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        if 'result' in fields and fields['result'] is not None:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False, default=str)
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {columns}, updated = ? WHERE id = ?", (*fields.values(), time.time(), job_id))
+
+    def get(self, job_id: str):
+        """The job as a dict (request and result decoded), None if unknown or expired"""
+        rows = self._execute(
+            "SELECT id, status, stage, progress, request, result, error, created, updated FROM jobs WHERE id = ?",
+            (job_id.strip(),),
+        )
+        if not rows:
+            return None
+
+        job = dict(zip(['id', 'status', 'stage', 'progress', 'request', 'result', 'error', 'created', 'updated'], rows[0]))
+        job['request'] = json.loads(job['request'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def unfinished(self):
+        """Ids of jobs that were queued or running, oldest first"""
+        rows = self._execute("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", (QUEUED, RUNNING))
+        return [row[0] for row in rows]
+
+    def purge(self):
+        """Delete jobs finished more than ttl seconds ago"""
+        self._execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, time.time() - self.ttl))
+
+
+def run_job(store: JobStore, job_id: str):
+    """Run one job to completion, recording progress and the result in store"""
+    job = store.get(job_id)
+    request = job['request']
+    quiz = Quiz()
+    stages = quiz.stages(request['gen_type'], request['question_types'])
+
+    def progress(stage):
+        store.update(job_id, stage=stage, progress=stages.index(stage) / len(stages))
+
+    store.update(job_id, status=RUNNING, progress=0.0)
+    with metrics.request("job", gen_type=request['gen_type'], job_id=job_id) as log:
+        try:
+            state = quiz.create(progress=progress, **request)
+        except Exception as e:
+            log.status = 'error'
+            store.update(job_id, status=FAILED, error=str(e))
+            return
+    store.update(job_id, status=DONE, stage=None, progress=1.0, result={k: state[k] for k in RESULT_FIELDS})
+
+
+class JobQueue:
+    """
+    Runs generation jobs in the background, independent of the browser
+    session that submitted them: closing the tab doesn't cancel a job, and
+    its result can be fetched later by job id. Jobs left unfinished by a
+    restart are picked up again by resume().
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="quiz-job")
+        return self._pool
+
+    def _run(self, job_id: str):
+        try:
+            # The NLP work is CPU-bound, so it runs on the shared process pool
+            executors.run_cpu(run_job, self.store, job_id)
+        except Exception as e:
+            print(f"WARNING: Job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e))
+
+    def submit(self, gen_type: str, input: str, num_questions: int, question_types: list, difficulty: str, sentences: list = None, use_cache: bool = True) -> str:
+        """Queue a quiz generation (the arguments of Quiz.create), returns its job id"""
+        job_id = self.store.create({
+            'gen_type': gen_type,
+            'input': input,
+            'num_questions': num_questions,
+            'question_types': question_types,
+            'difficulty': difficulty,
+            'sentences': sentences,
+            'use_cache': use_cache,
+        })
+        self._get_pool().submit(self._run, job_id)
+        return job_id
+
+    def resume(self):
+        """Requeue the jobs a previous run left unfinished, and drop expired ones"""
+        try:
+            self.store.purge()
+            job_ids = self.store.unfinished()
+        except sqlite3.Error as e:
+            print(f"WARNING: Could not read the job store: {e}")
+            return
+        for job_id in job_ids:
+            self.store.update(job_id, status=QUEUED, stage=None, progress=0.0)
+            self._get_pool().submit(self._run, job_id)
+        jobs_resumed.inc(len(job_ids))
+
+    def get(self, job_id: str):
+        return self.store.get(job_id)
+
+    async def watch(self, job_id: str, interval: float = JOB_POLL_INTERVAL):
+        """Yield the job every interval seconds until it has finished (or None if it is unknown)"""
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            yield job
+            if job is None or job['status'] in (DONE, FAILED):
+                return
+            await asyncio.sleep(interval)
+
+
+# Process-wide job queue shared by every session
+job_queue = JobQueue(JobStore())
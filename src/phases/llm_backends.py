@@ -0,0 +1,502 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+from typing import AsyncIterator, Optional, TypedDict
+from dotenv import load_dotenv
+
+from .llm_cache import make_key
+from .startup import lazy_import
+
+# Load environment variables if .env exists
+load_dotenv()
+
+API_KEY = os.getenv("GROQ_API_KEY")
+
+# Which backend answers chat completions: 'groq', 'openai' (any
+# OpenAI-compatible HTTP endpoint, e.g. a local vLLM or Ollama server) or
+# 'fake' (offline, deterministic, for load tests)
+LLM_BACKEND = os.getenv("QUIZ_LLM_BACKEND", "groq")
+
+# OpenAI-compatible endpoint used by the 'openai' backend
+LLM_BASE_URL = os.getenv("QUIZ_LLM_BASE_URL", "http://localhost:8000/v1")
+LLM_API_KEY = os.getenv("QUIZ_LLM_API_KEY", "")
+
+# Latency (mean and standard deviation, in seconds) and failure rate of the fake backend
+FAKE_LATENCY = float(os.getenv("QUIZ_LLM_FAKE_LATENCY", "1.0"))
+FAKE_JITTER = float(os.getenv("QUIZ_LLM_FAKE_JITTER", "0.25"))
+FAKE_FAILURE_RATE = float(os.getenv("QUIZ_LLM_FAKE_FAILURE_RATE", "0"))
+
+# 'record' saves every response of the backend to QUIZ_LLM_RECORDINGS,
+# 'replay' answers from that file instead of calling the backend
+LLM_RECORD = os.getenv("QUIZ_LLM_RECORD", "")
+LLM_RECORDINGS = os.getenv("QUIZ_LLM_RECORDINGS", "llm_recordings.jsonl")
+
+# HTTP settings of the shared clients (seconds)
+LLM_TIMEOUT = float(os.getenv("QUIZ_LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("QUIZ_LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_CONNECTIONS = int(os.getenv("QUIZ_LLM_MAX_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("QUIZ_LLM_KEEPALIVE_EXPIRY", "30"))
+
+
+class Completion(TypedDict):
+    content: str
+    finish_reason: Optional[str]
+    prompt_tokens: Optional[int]
+    completion_tokens: Optional[int]
+
+
+class LLMStatusError(Exception):
+    """Error status returned by a backend that doesn't raise Groq SDK errors"""
+
+    def __init__(self, status_code: int, message: str = "", retry_after: float = None):
+        super().__init__(f"LLM backend returned {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _http_settings():
+    """Timeout and connection pool limits shared by every HTTP client"""
+    httpx = lazy_import("httpx")
+    timeout = httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+    return httpx, timeout, limits
+
+
+class GroqBackend:
+    """
+    Groq API through a shared async SDK client, created on first use. Its
+    connection pool keeps connections alive between requests; it is only
+    used on the llm_client event loop.
+    """
+
+    name = "groq"
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key or API_KEY
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _sdk_client(self):
+        with self._lock:
+            if self._client is None:
+                # Checked here rather than at import so the app starts without a key
+                if not self.api_key:
+                    raise ValueError("GROQ_API_KEY environment variable is missing.")
+
+                httpx, timeout, limits = _http_settings()
+                # Retries are done by llm_client so the policy is ours
+                self._client = lazy_import("groq").AsyncGroq(
+                    api_key=self.api_key,
+                    timeout=timeout,
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(timeout=timeout, limits=limits),
+                )
+        return self._client
+
+    @staticmethod
+    def _request(messages, model, temperature, max_tokens, stream=False):
+        request = dict(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=stream,
+        )
+        # Groq does not stream in JSON mode, streams rely on the prompt
+        if not stream:
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    @staticmethod
+    def _completion(response) -> Completion:
+        usage = response.usage
+        return Completion(
+            content=response.choices[0].message.content,
+            finish_reason=response.choices[0].finish_reason,
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+        )
+
+    async def complete(self, messages, model, temperature, max_tokens) -> Completion:
+        return self._completion(await self._sdk_client().chat.completions.create(
+            **self._request(messages, model, temperature, max_tokens)
+        ))
+
+    async def stream(self, messages, model, temperature, max_tokens) -> AsyncIterator[Completion]:
+        """Open a streamed completion; the returned async iterator yields one Completion per delta"""
+        stream = await self._sdk_client().chat.completions.create(
+            **self._request(messages, model, temperature, max_tokens, stream=True)
+        )
+        return self._iter_stream(stream)
+
+    @staticmethod
+    def _chunk_completion(chunk) -> Completion:
+        content = ""
+        finish_reason = None
+        if chunk.choices:
+            content = chunk.choices[0].delta.content or ""
+            finish_reason = chunk.choices[0].finish_reason
+        # Groq reports usage on the last chunk under x_groq
+        usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None)
+        return Completion(
+            content=content,
+            finish_reason=finish_reason,
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+        )
+
+    async def _iter_stream(self, stream):
+        async for chunk in stream:
+            yield self._chunk_completion(chunk)
+
+
+class OpenAICompatibleBackend:
+    """Any server implementing the OpenAI /chat/completions API (vLLM, Ollama, llama.cpp, ...)"""
+
+    name = "openai"
+
+    def __init__(self, base_url: str = None, api_key: str = None):
+        self.base_url = (base_url or LLM_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else LLM_API_KEY
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _http_client(self):
+        with self._lock:
+            if self._client is None:
+                httpx, timeout, limits = _http_settings()
+                headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+                self._client = httpx.AsyncClient(base_url=self.base_url, headers=headers, timeout=timeout,
+                                                 limits=limits)
+        return self._client
+
+    @staticmethod
+    def _payload(messages, model, temperature, max_tokens, stream=False):
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream,
+        }
+        if not stream:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    @staticmethod
+    def _check(response):
+        if response.status_code >= 400:
+            retry_after = response.headers.get("retry-after")
+            try:
+                retry_after = float(retry_after)
+            except (TypeError, ValueError):
+                retry_after = None
+            raise LLMStatusError(response.status_code, response.text[:200], retry_after)
+
+    @staticmethod
+    def _completion(data) -> Completion:
+        choice = data["choices"][0]
+        usage = data.get("usage") or {}
+        return Completion(
+            content=choice["message"]["content"],
+            finish_reason=choice.get("finish_reason"),
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+        )
+
+    async def complete(self, messages, model, temperature, max_tokens) -> Completion:
+        response = await self._http_client().post(
+            "/chat/completions", json=self._payload(messages, model, temperature, max_tokens)
+        )
+        self._check(response)
+        return self._completion(response.json())
+
+    async def stream(self, messages, model, temperature, max_tokens) -> AsyncIterator[Completion]:
+        client = self._http_client()
+        request = client.build_request(
+            "POST", "/chat/completions", json=self._payload(messages, model, temperature, max_tokens, stream=True)
+        )
+        response = await client.send(request, stream=True)
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+            self._check(response)
+        return self._iter_stream(response)
+
+    @staticmethod
+    def _line_completion(line) -> Optional[Completion]:
+        """Completion of one server-sent event line, None for other lines"""
+        if not line.startswith("data:"):
+            return None
+        chunk = json.loads(line[len("data:"):].strip())
+        choice = (chunk.get("choices") or [{}])[0]
+        usage = chunk.get("usage") or {}
+        return Completion(
+            content=(choice.get("delta") or {}).get("content") or "",
+            finish_reason=choice.get("finish_reason"),
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+        )
+
+    async def _iter_stream(self, response):
+        try:
+            async for line in response.aiter_lines():
+                if line.startswith("data:") and line[len("data:"):].strip() == "[DONE]":
+                    break
+                completion = self._line_completion(line)
+                if completion is not None:
+                    yield completion
+        finally:
+            await response.aclose()
+
+
+class FakeBackend:
+    """
+    Offline stand-in that answers with a deterministic quiz built from the
+    prompt's source material. Latency is drawn from a normal distribution and
+    a fraction of requests fail with a 429 or 503, to exercise retries.
+    """
+
+    name = "fake"
+
+    # Streamed responses are sent in pieces of this many characters
+    STREAM_PIECE_CHARS = 16
+
+    def __init__(self, latency: float = None, jitter: float = None, failure_rate: float = None, seed: int = None):
+        self.latency = FAKE_LATENCY if latency is None else latency
+        self.jitter = FAKE_JITTER if jitter is None else jitter
+        self.failure_rate = FAKE_FAILURE_RATE if failure_rate is None else failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        """Latency of the next request, raising an injected failure instead for some"""
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            status_code = self._random.choice([429, 503])
+            latency = max(0.0, self._random.gauss(self.latency, self.jitter))
+        if failed:
+            raise LLMStatusError(status_code, "injected failure", retry_after=None)
+        return latency
+
+    def _respond(self, messages, max_tokens) -> Completion:
+        prompt = messages[-1]["content"]
+        rng = random.Random(hashlib.sha256(json.dumps(messages).encode("utf-8")).digest())
+
+        count = re.search(r"Create \*\*(\d+)\*\*", prompt)
+        count = int(count.group(1)) if count else 5
+        types = re.search(r"Use question types: (.*)\.", prompt)
+        types = [t.strip() for t in types.group(1).split(",")] if types else []
+        types = [t for t in types if t in ("fill_blank", "mcq", "t/f", "short_answer")] or ["short_answer"]
+
+        source = prompt.rsplit("SOURCE MATERIAL:", 1)[-1].strip().strip('"')
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', source) if len(s.split()) >= 4]
+        words = re.findall(r"[A-Za-z]{5,}", source) or ["material"]
+
+        questions = []
+        for i in range(count):
+            q_type = types[i % len(types)]
+            sentence = sentences[rng.randrange(len(sentences))] if sentences else "The material is about testing."
+            word = rng.choice(words)
+            if q_type == "fill_blank":
+                question = {"question": sentence.replace(word, "_____", 1), "answer": word}
+            elif q_type == "t/f":
+                question = {"question": f"True or false: {sentence}", "answer": "True"}
+            elif q_type == "mcq":
+                others = [w for w in dict.fromkeys(words) if w != word]
+                options = rng.sample(others, min(3, len(others))) + [word]
+                rng.shuffle(options)
+                letters = "ABCD"
+                question = {
+                    "question": f"Which word appears in the material near \"{sentence[:40]}\"?",
+                    "answer": ", ".join(f"{letters[j]}) {o}" for j, o in enumerate(options))
+                              + f". Correct: {letters[options.index(word)]}",
+                }
+            else:
+                question = {"question": f"What does the material say about {word}?", "answer": sentence}
+            question["type"] = q_type
+            questions.append(question)
+
+        content = json.dumps({"questions": questions})
+        finish_reason = "stop"
+        # About 4 characters per token, like the real models
+        if len(content) > max_tokens * 4:
+            content = content[:max_tokens * 4]
+            finish_reason = "length"
+        prompt_chars = sum(len(m["content"]) for m in messages)
+        return Completion(
+            content=content,
+            finish_reason=finish_reason,
+            prompt_tokens=prompt_chars // 4 + 4 * len(messages),
+            completion_tokens=len(content) // 4,
+        )
+
+    async def complete(self, messages, model, temperature, max_tokens) -> Completion:
+        await asyncio.sleep(self._draw())
+        return self._respond(messages, max_tokens)
+
+    async def stream(self, messages, model, temperature, max_tokens) -> AsyncIterator[Completion]:
+        latency = self._draw()
+        completion = self._respond(messages, max_tokens)
+        # A fifth of the latency before the first piece, the rest spread over the pieces
+        await asyncio.sleep(latency * 0.2)
+        return self._iter_stream(completion, latency * 0.8)
+
+    def _pieces(self, completion):
+        content = completion["content"]
+        pieces = [content[i:i + self.STREAM_PIECE_CHARS] for i in range(0, len(content), self.STREAM_PIECE_CHARS)]
+        chunks = [Completion(content=piece, finish_reason=None, prompt_tokens=None, completion_tokens=None)
+                  for piece in pieces]
+        chunks.append(Completion(content="", finish_reason=completion["finish_reason"],
+                                 prompt_tokens=completion["prompt_tokens"],
+                                 completion_tokens=completion["completion_tokens"]))
+        return chunks
+
+    async def _iter_stream(self, completion, duration):
+        chunks = self._pieces(completion)
+        for i, chunk in enumerate(chunks):
+            if 0 < i < len(chunks) - 1:
+                await asyncio.sleep(duration / (len(chunks) - 1))
+            yield chunk
+
+
+class RecordReplayBackend:
+    """
+    Wraps another backend to record its responses to a JSON lines file, or
+    answers from such a file without calling any backend (mode='replay').
+    Requests are matched by the same fingerprint as the response cache.
+    """
+
+    def __init__(self, path: str, mode: str, backend=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown record mode '{mode}', expected 'record' or 'replay'.")
+        if mode == "record" and backend is None:
+            raise ValueError("Recording needs a backend to record.")
+
+        self.path = os.path.expanduser(path)
+        self.mode = mode
+        self.backend = backend
+        self.name = f"{mode}:{backend.name}" if backend else mode
+        self._lock = threading.Lock()
+        self._recordings = {}
+
+        if mode == "replay":
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._recordings[entry["key"]] = entry["completion"]
+
+    def _replay(self, messages, model, temperature, max_tokens, stream=False) -> Completion:
+        completion = self._recordings.get(make_key(model, messages, temperature, max_tokens, stream))
+        if completion is None:
+            raise KeyError(f"No recorded response for this request in {self.path}")
+        return Completion(**completion)
+
+    def _record(self, messages, model, temperature, max_tokens, completion: Completion, stream=False):
+        entry = {"key": make_key(model, messages, temperature, max_tokens, stream), "model": model, "completion": completion}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    async def complete(self, messages, model, temperature, max_tokens) -> Completion:
+        if self.mode == "replay":
+            return self._replay(messages, model, temperature, max_tokens)
+        completion = await self.backend.complete(messages, model, temperature, max_tokens)
+        self._record(messages, model, temperature, max_tokens, completion)
+        return completion
+
+    async def stream(self, messages, model, temperature, max_tokens) -> AsyncIterator[Completion]:
+        if self.mode == "replay":
+            return self._replay_stream(self._replay(messages, model, temperature, max_tokens, stream=True))
+        return self._record_stream(await self.backend.stream(messages, model, temperature, max_tokens),
+                                   messages, model, temperature, max_tokens)
+
+    @staticmethod
+    async def _replay_stream(completion):
+        yield completion
+
+    @staticmethod
+    def _merge(last: Completion, completion: Completion) -> Completion:
+        """Final fields seen so far in a stream, carried past chunks that leave them empty"""
+        return Completion(
+            content="",
+            finish_reason=completion["finish_reason"] or last["finish_reason"],
+            prompt_tokens=completion["prompt_tokens"] or last["prompt_tokens"],
+            completion_tokens=completion["completion_tokens"] or last["completion_tokens"],
+        )
+
+    async def _record_stream(self, stream, messages, model, temperature, max_tokens):
+        parts = []
+        last = Completion(content="", finish_reason=None, prompt_tokens=None, completion_tokens=None)
+        async for completion in stream:
+            parts.append(completion["content"])
+            last = self._merge(last, completion)
+            yield completion
+        self._record(messages, model, temperature, max_tokens, Completion(last, content="".join(parts)), stream=True)
+
+
+def build_backend(name: str = None, record: str = None, recordings: str = None):
+    """Backend for a QUIZ_LLM_BACKEND name, wrapped for recording or replay if asked"""
+    name = name or LLM_BACKEND
+    record = LLM_RECORD if record is None else record
+
+    if record == "replay":
+        return RecordReplayBackend(recordings or LLM_RECORDINGS, "replay")
+
+    if name == "groq":
+        backend = GroqBackend()
+    elif name == "openai":
+        backend = OpenAICompatibleBackend()
+    elif name == "fake":
+        backend = FakeBackend()
+    else:
+        raise ValueError(f"Unknown LLM backend '{name}', expected 'groq', 'openai' or 'fake'.")
+
+    if record == "record":
+        backend = RecordReplayBackend(recordings or LLM_RECORDINGS, "record", backend)
+    return backend
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _forget_backend():
+    # Its async clients belong to the parent's event loop, which a forked child doesn't run
+    global _backend, _backend_lock
+    _backend = None
+    _backend_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_backend)
+
+
+def get_backend():
+    """Process-wide backend from the QUIZ_LLM_* settings, built on first use"""
+    global _backend
+
+    with _backend_lock:
+        if _backend is None:
+            _backend = build_backend()
+        return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the process-wide backend (e.g. with a FakeBackend in a benchmark).
+    Forked workers build their own from the QUIZ_LLM_* settings.
+    """
+    global _backend
+
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite file holding raw LLM responses; empty disables the cache
+LLM_CACHE_PATH = os.getenv(
+    "QUIZ_LLM_CACHE_PATH",
+    os.path.join("~", ".cache", "quiz_generator", "llm_responses.sqlite3"),
+)
+
+# Seconds a cached response stays valid
+LLM_CACHE_TTL = float(os.getenv("QUIZ_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Total size of cached responses, least recently used ones are evicted first
+LLM_CACHE_MAX_BYTES = int(os.getenv("QUIZ_LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def make_key(model: str, messages, temperature: float, max_tokens: int, stream: bool = False) -> str:
+    """
+    Fingerprint of a chat completion request. Streamed requests are not in
+    JSON mode, so their free-form responses get keys of their own.
+    """
+    request = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+    if stream:
+        request["stream"] = True
+    request = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Raw LLM responses in SQLite, keyed by request fingerprint.
+
+    Entries expire after ttl seconds; once the stored responses exceed
+    max_bytes, the least recently used ones are deleted. One connection is
+    shared by every thread behind a lock.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = os.path.expanduser(path) if path else None
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._db = None
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+        }
+
+    def _connect(self):
+        # Called with self._lock held; opened on first use so import stays cheap
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " response TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.commit()
+        return self._db
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def get(self, key: str):
+        """Cached raw response for key, or None if missing or expired"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        try:
+            with self._lock:
+                db = self._connect()
+                row = db.execute(
+                    "SELECT response FROM responses WHERE key = ? AND created > ?",
+                    (key, now - self.ttl),
+                ).fetchone()
+                if row is None:
+                    self._counters['misses'] += 1
+                    return None
+                db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                db.commit()
+                self._counters['hits'] += 1
+                return row[0]
+        except sqlite3.Error as e:
+            print(f"WARNING: LLM cache lookup failed: {e}")
+            return None
+
+    def put(self, key: str, model: str, response: str):
+        if not self.enabled:
+            return
+
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        try:
+            with self._lock:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, size, now, now),
+                )
+                db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+                self._evict(db)
+                db.commit()
+        except sqlite3.Error as e:
+            print(f"WARNING: LLM cache write failed: {e}")
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._counters['evictions'] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            if self.enabled and self._db is not None:
+                stats['entries'], stats['bytes'] = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            db = self._connect()
+            db.execute("DELETE FROM responses")
+            db.commit()
+
+
+# Process-wide cache shared by every LLM request
+response_cache = ResponseCache()
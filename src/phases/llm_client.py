@@ -1,24 +1,58 @@
 # -*- coding: utf-8 -*-
 # src/phases/llm_client.py
 
+import asyncio
 import json
 import os
+import random
+import re
+import threading
+import time
 from typing import List, Literal, Optional, TypedDict
-from groq import Groq
-from dotenv import load_dotenv
+import numpy as np
 
-# Load environment variables if .env exists
-load_dotenv()
+from . import algorithms, metrics, preprocessing, tokens
+from .llm_backends import LLMStatusError, get_backend
+from .llm_cache import make_key, response_cache
+from .scheduler import PRIORITY_INTERACTIVE, RequestScheduler
+from .startup import lazy_import
 
-API_KEY = os.getenv("GROQ_API_KEY")
+DEFAULT_MODEL = os.getenv("QUIZ_LLM_MODEL", "llama-3.3-70b-versatile")
 
-if not API_KEY:
-    raise ValueError("GROQ_API_KEY environment variable is missing.")
+# Retries of rate-limited (429), server error (5xx) and connection failures,
+# with jittered exponential backoff between attempts
+LLM_MAX_RETRIES = int(os.getenv("QUIZ_LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("QUIZ_LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("QUIZ_LLM_BACKOFF_MAX", "20"))
 
-DEFAULT_MODEL = "llama-3.3-70b-versatile"
+# What to do with sources over the token budget: 'compress' keeps the most
+# salient, non-redundant sentences that fit, 'map_reduce' quizzes every chunk
+# of the document concurrently, 'truncate' only the beginning, and 'auto'
+# compresses sources up to LLM_COMPRESS_MAX_RATIO times the budget and
+# map-reduces longer ones
+LONG_DOCUMENT_MODE = os.getenv("QUIZ_LLM_LONG_DOCUMENT_MODE", "auto")
+LONG_DOCUMENT_MODES = ("auto", "truncate", "compress", "map_reduce")
+if LONG_DOCUMENT_MODE not in LONG_DOCUMENT_MODES:
+    raise ValueError(f"Unknown long document mode '{LONG_DOCUMENT_MODE}', "
+                     f"expected 'auto', 'truncate', 'compress' or 'map_reduce'.")
+LLM_COMPRESS_MAX_RATIO = float(os.getenv("QUIZ_LLM_COMPRESS_MAX_RATIO", "4"))
 
-# Prevent model context-length failure
-MAX_SOURCE_CHARS = 8000  # safe limit for most Groq models
+# Vocabulary of the TF-IDF model that scores sentences for compression
+COMPRESSION_MAX_FEATURES = 2000
+
+# Requests in flight at once for one long document
+LLM_CONCURRENCY = int(os.getenv("QUIZ_LLM_CONCURRENCY", "4"))
+
+llm_retries = metrics.registry.counter(
+    "quiz_llm_retries_total", "LLM requests retried after a transient failure", ["error"])
+long_documents = metrics.registry.counter(
+    "quiz_llm_long_documents_total", "Sources over the prompt limit, by how they were shortened", ["mode"])
+
+_WORD_RE = re.compile(r'\w+')
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+
+# Admits every LLM request of this process under the provider's rate limits
+scheduler = RequestScheduler()
 
 QuestionType = Literal["fill_blank", "mcq", "t/f", "short_answer"]
 class Question(TypedDict):
@@ -26,34 +60,334 @@ class Question(TypedDict):
     answer: str
     type: QuestionType
 
-def _get_client() -> Groq:
-    """Initialize Groq client with partial-key debug logging."""
-    print("DEBUG: Using Groq API key prefix:", API_KEY[:8] + "...")
-    return Groq(api_key=API_KEY)
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _forget_loop():
+    # The loop's thread does not exist in a forked child (e.g. a CPU pool worker)
+    global _loop, _loop_lock
+    _loop = None
+    _loop_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_loop)
+
+
+def _get_loop():
+    """
+    Event loop on a daemon thread that runs every async LLM request, so the
+    backend's async client and its connections live on a single loop
+    """
+    global _loop
+
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-async", daemon=True).start()
+    return _loop
+
+
+def run_async(coro):
+    """
+    Run a coroutine on the shared LLM event loop and wait for its result. It
+    runs in a copy of the caller's context, so the metrics it records reach
+    the caller's request.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def iterate_sync(agen):
+    """Iterate an async generator on the shared LLM event loop from a thread without one"""
+    try:
+        while True:
+            try:
+                item = run_async(agen.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        run_async(agen.aclose())
+
+
+async def run_on_loop(coro):
+    """Await a coroutine on the shared LLM event loop from another event loop (e.g. Gradio's)"""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _get_loop()))
+
+
+async def iterate_on_loop(agen):
+    """Iterate an async generator on the shared LLM event loop from another event loop"""
+    while True:
+        try:
+            item = await run_on_loop(agen.__anext__())
+        except StopAsyncIteration:
+            return
+        yield item
+
+
+def _retry_delay(attempt: int, error) -> float:
+    """Seconds to wait before retry number attempt (0-based)"""
+    # Honor the server's Retry-After on rate limits
+    if getattr(error, "retry_after", None) is not None:
+        return min(error.retry_after, LLM_BACKOFF_MAX)
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except (TypeError, ValueError):
+            pass
+
+    # Full jitter keeps concurrent workers from retrying in lockstep
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def _is_retryable(error) -> bool:
+    if isinstance(error, LLMStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    if isinstance(error, lazy_import("httpx").TransportError):
+        return True
+
+    groq = lazy_import("groq")
+    if isinstance(error, groq.APIConnectionError):
+        return True
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+async def _with_retries(request):
+    """Await request(), retrying transient failures up to LLM_MAX_RETRIES times"""
+    attempt = 0
+    while True:
+        try:
+            return await request()
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _retry_delay(attempt, e)
+            if getattr(e, "status_code", None) == 429:
+                # Hold back every other request too instead of letting them all hit the limit
+                scheduler.pause(delay)
+            llm_retries.inc(error=getattr(e, "status_code", None) or type(e).__name__)
+            metrics.count('llm_retries')
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def _admission_tokens(messages: List[dict], model: str, max_tokens: int) -> int:
+    """Tokens a request may use, as charged to the scheduler's tokens-per-minute bucket"""
+    return tokens.estimator.count_messages(messages, model) + max_tokens
+
+
+def _record_usage(model: str, messages: List[dict], completion, admitted_tokens: int):
+    """Record the token usage of a response and calibrate the token estimator with it"""
+    truncated = completion["finish_reason"] == "length"
+    if truncated:
+        print(f"WARNING: LLM response hit max_tokens and was cut off ({model})")
+
+    prompt_tokens = completion["prompt_tokens"]
+    completion_tokens = completion["completion_tokens"]
+    if prompt_tokens is None:
+        return
+    tokens.usage.record(prompt_tokens, completion_tokens or 0, truncated)
+    scheduler.settle(admitted_tokens, prompt_tokens + (completion_tokens or 0))
+
+    # Leave out the chat template tokens (see TokenEstimator.count_messages)
+    content_chars = sum(len(m["content"]) for m in messages)
+    tokens.estimator.observe(model, content_chars, prompt_tokens - 4 * len(messages))
+    metrics.count('prompt_tokens', prompt_tokens)
+    metrics.count('completion_tokens', completion_tokens or 0)
+
+
+def _store_response(key: str, model: str, completion) -> str:
+    """Cache the raw content of a complete response and return it"""
+    content = completion["content"]
+    # Responses cut off by max_tokens are not worth keeping
+    if content and completion["finish_reason"] != "length":
+        response_cache.put(key, model, content)
+    return content
+
+
+def _cache_key(backend, model: str, messages: List[dict], temperature: float, max_tokens: int,
+               stream: bool = False) -> str:
+    # Responses of different backends (e.g. the fake one) never mix in the cache,
+    # nor do streamed ones with JSON-mode ones
+    return make_key(f"{backend.name}/{model}", messages, temperature, max_tokens, stream=stream)
 
 
-def chat_completion(
+async def _admit(messages: List[dict], model: str, max_tokens: int, priority: int) -> int:
+    """Wait for the scheduler to admit a request, returns the tokens charged for it"""
+    admitted_tokens = _admission_tokens(messages, model, max_tokens)
+    # Waiting for the scheduler blocks, so it happens off the event loop
+    metrics.record_span("llm.queue", await asyncio.to_thread(scheduler.acquire, admitted_tokens, priority))
+    return admitted_tokens
+
+
+async def achat_completion(
     messages: List[dict],
     model: Optional[str] = None,
     temperature: float = 0.3,
     max_tokens: int = 512,
+    use_cache: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
 ) -> str:
     """
-    Wrapper for Groq chat completion requests.
+    Chat completion request to the configured backend (Groq by default).
     Provides a consistent interface and prevents massive token usage.
+    Responses are served from the LLM response cache unless use_cache is False;
+    other requests wait for their turn in the scheduler by priority.
+    Must run on the loop from _get_loop (see run_async and run_on_loop).
     """
-    client = _get_client()
+    model = model or DEFAULT_MODEL
+    backend = get_backend()
+    key = _cache_key(backend, model, messages, temperature, max_tokens)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    admitted_tokens = await _admit(messages, model, max_tokens, priority)
+    with metrics.span("llm"):
+        completion = await _with_retries(lambda: backend.complete(messages, model, temperature, max_tokens))
+
+    _record_usage(model, messages, completion, admitted_tokens)
+    return _store_response(key, model, completion)
+
+
+def chat_completion(messages: List[dict], model: Optional[str] = None, temperature: float = 0.3,
+                    max_tokens: int = 512, use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE) -> str:
+    """Blocking achat_completion, for callers without an event loop"""
+    return run_async(achat_completion(messages, model, temperature, max_tokens, use_cache, priority))
+
+
+async def astream_chat_completion(
+    messages: List[dict],
+    model: Optional[str] = None,
+    temperature: float = 0.3,
+    max_tokens: int = 512,
+    use_cache: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+):
+    """
+    achat_completion that yields the response text piece by piece as it arrives.
+    Streams are not in JSON mode (Groq doesn't support it), so the JSON shape
+    relies on the prompt. A cached response is yielded whole.
+    """
+    model = model or DEFAULT_MODEL
+    backend = get_backend()
+    key = _cache_key(backend, model, messages, temperature, max_tokens, stream=True)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    admitted_tokens = await _admit(messages, model, max_tokens, priority)
+    start = time.perf_counter()
+    stream = await _with_retries(lambda: backend.stream(messages, model, temperature, max_tokens))
+
+    parts = []
+    final = {"content": "", "finish_reason": None, "prompt_tokens": None, "completion_tokens": None}
+    async for chunk in stream:
+        if chunk["content"]:
+            parts.append(chunk["content"])
+            yield chunk["content"]
+        for field in ("finish_reason", "prompt_tokens", "completion_tokens"):
+            if chunk[field] is not None:
+                final[field] = chunk[field]
+
+    final["content"] = "".join(parts)
+    # Streams are timed from the request to their last chunk
+    metrics.record_span("llm", time.perf_counter() - start)
+    _record_usage(model, messages, final, admitted_tokens)
+    _store_response(key, model, final)
+
+
+def stream_chat_completion(messages: List[dict], model: Optional[str] = None, temperature: float = 0.3,
+                           max_tokens: int = 512, use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE):
+    """Blocking astream_chat_completion, for callers without an event loop"""
+    return iterate_sync(astream_chat_completion(messages, model, temperature, max_tokens, use_cache, priority))
+
+
+def _validate_question(q) -> Optional[Question]:
+    """Typed Question from one parsed question object, None if it is malformed"""
+    if not isinstance(q, dict):
+        return None
 
-    response = client.chat.completions.create(
-        model=model or DEFAULT_MODEL,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens,
-        stream=False,
-        response_format={"type": "json_object"}
+    # Ensure required fields exist
+    if "question" not in q or "answer" not in q or "type" not in q:
+        print(f"WARNING: Skipping malformed question: {q}")
+        return None
+
+    # Validate type field
+    if q["type"] not in ["fill_blank", "mcq", "t/f", "short_answer"]:
+        print(f"WARNING: Invalid question type '{q['type']}', defaulting to 'short_answer'")
+        q["type"] = "short_answer"
+
+    return Question(
+        question=str(q["question"]),
+        answer=str(q["answer"]),
+        type=q["type"]
     )
 
-    return response.choices[0].message.content
+
+class QuestionStreamParser:
+    """
+    Extracts question objects from a JSON response while it is still streaming.
+    Every object of the first array in the response is returned by feed as
+    soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._in_string = False
+        self._escape = False
+        self._depth = 0
+        self._start = None
+
+    def feed(self, text: str) -> List[Question]:
+        """Add streamed text, returns the questions completed by it"""
+        self.buffer += text
+        completed = []
+
+        buffer = self.buffer
+        for pos in range(self._pos, len(buffer)):
+            ch = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif not self._in_array:
+                if ch == "[":
+                    self._in_array = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._start = pos
+                self._depth += 1
+            elif ch == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        question = _validate_question(json.loads(buffer[self._start:pos + 1]))
+                    except json.JSONDecodeError:
+                        question = None
+                    if question is not None:
+                        completed.append(question)
+            elif ch == "]" and self._depth == 0:
+                self._in_array = False
+
+        self._pos = len(buffer)
+        return completed
+
 
 def _parse_questions(raw_response: str) -> List[Question]:
     """
@@ -74,25 +408,10 @@ def _parse_questions(raw_response: str) -> List[Question]:
         # Validate and type-check each question
         validated_questions: List[Question] = []
         for q in questions:
-            if not isinstance(q, dict):
-                continue
-                
-            # Ensure required fields exist
-            if "question" not in q or "answer" not in q or "type" not in q:
-                print(f"WARNING: Skipping malformed question: {q}")
-                continue
-            
-            # Validate type field
-            if q["type"] not in ["fill_blank", "mcq", "t/f", "short_answer"]:
-                print(f"WARNING: Invalid question type '{q['type']}', defaulting to 'short_answer'")
-                q["type"] = "short_answer"
-            
-            validated_questions.append(Question(
-                question=str(q["question"]),
-                answer=str(q["answer"]),
-                type=q["type"]
-            ))
-        
+            question = _validate_question(q)
+            if question is not None:
+                validated_questions.append(question)
+
         return validated_questions
         
     except json.JSONDecodeError as e:
@@ -104,27 +423,7 @@ def _parse_questions(raw_response: str) -> List[Question]:
         return []
 
 
-def generate_from_llm(
-    source_text: str,
-    num_questions: int = 5,
-    question_types: Optional[List[str]] = None,
-    difficulty: str = None
-) -> str:
-    """
-    Generates a quiz using Groq LLM with context-size protection.
-    Ensures oversized source text does NOT break the API.
-    """
-    if question_types is None:
-        question_types = []
-
-    # Convert the list into a readable string for the prompt.
-    type_str = ", ".join(question_types) if question_types else "any type"
-
-    # Prevent context-size overflow errors
-    if len(source_text) > MAX_SOURCE_CHARS:
-        print(f"DEBUG: Input text length {len(source_text)} exceeds limit; truncating.")
-        source_text = source_text[:MAX_SOURCE_CHARS] + "\n\n[TRUNCATED]"
-
+def _build_messages(source_text: str, num_questions: int, type_str: str, difficulty: str) -> List[dict]:
     system_msg = (
         "You are an expert quiz generator. "
         "Produce a structured Markdown quiz with questions followed by answers."
@@ -157,11 +456,277 @@ SOURCE MATERIAL:
 \"\"\"{source_text}\"\"\"
 """
 
-    raw_response = chat_completion(
-        [
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg},
-        ]
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": user_msg},
+    ]
+
+
+def source_char_budget(model: str, num_questions: int, question_types: List[str], difficulty: str) -> int:
+    """
+    Characters of source material that fit in one request: the source token
+    budget, bounded by what the model's context leaves after the prompt and
+    the completion, converted with the calibrated chars-per-token ratio
+    """
+    type_str = ", ".join(question_types) if question_types else "any type"
+    prompt_tokens = tokens.estimator.count_messages(_build_messages("", num_questions, type_str, difficulty), model)
+    completion_tokens = tokens.completion_budget(model, num_questions, question_types)
+    context_tokens = tokens.model_limits(model)[0]
+
+    source_tokens = min(tokens.SOURCE_TOKENS, context_tokens - prompt_tokens - completion_tokens)
+    return tokens.estimator.chars_for(max(source_tokens, 0), model)
+
+
+def chunk_salience(chunks: List[str]) -> List[float]:
+    """
+    TF-IDF salience of every chunk: the summed weights of the document's top
+    terms over the chunk's sentences, from one vectorizer fit on the whole text
+    """
+    chunk_sentences = [preprocessing.preprocess_text(chunk) for chunk in chunks]
+    _, matrix = algorithms.build_tfidf([s for sentences in chunk_sentences for s in sentences])
+    if matrix is None:
+        return [float(len(chunk)) for chunk in chunks]
+
+    sentence_weights = np.asarray(matrix.sum(axis=1)).ravel()
+    salience = []
+    start = 0
+    for sentences in chunk_sentences:
+        salience.append(float(sentence_weights[start:start + len(sentences)].sum()))
+        start += len(sentences)
+    return salience
+
+
+def allocate_questions(weights: List[float], total: int) -> List[int]:
+    """Split total questions in proportion to weights (largest remainder method)"""
+    if sum(weights) <= 0:
+        weights = [1.0] * len(weights)
+    weight_sum = sum(weights)
+
+    shares = [total * w / weight_sum for w in weights]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(weights)), key=lambda i: shares[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _dedupe_questions(questions: List[Question]) -> List[Question]:
+    """Drop questions whose text repeats an earlier one, ignoring case and punctuation"""
+    seen = set()
+    unique = []
+    for q in questions:
+        key = " ".join(_WORD_RE.findall(q["question"].lower()))
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(q)
+    return unique
+
+
+async def agenerate_long_document(
+    source_text: str,
+    num_questions: int,
+    question_types: List[str],
+    difficulty: str,
+    chunk_chars: int,
+    model: str = DEFAULT_MODEL,
+    use_cache: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> List[Question]:
+    """
+    Map-reduce generation for sources over the token budget: chunks of at most
+    chunk_chars are quizzed concurrently (at most LLM_CONCURRENCY requests at
+    once), with questions allocated by salience, then merged and deduplicated.
+    """
+    type_str = ", ".join(question_types) if question_types else "any type"
+    chunks = algorithms.split_into_chunks(source_text, max_chars=chunk_chars)
+    allocation = allocate_questions(chunk_salience(chunks), num_questions)
+    jobs = [(chunk, count) for chunk, count in zip(chunks, allocation) if count > 0]
+    long_documents.inc(mode="map_reduce")
+    metrics.count('llm_chunks', len(jobs))
+
+    semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+
+    async def quiz_chunk(chunk, count):
+        async with semaphore:
+            raw_response = await achat_completion(
+                _build_messages(chunk, count, type_str, difficulty),
+                model=model,
+                max_tokens=tokens.completion_budget(model, count, question_types),
+                use_cache=use_cache,
+                priority=priority,
+            )
+        return _parse_questions(raw_response)
+
+    results = await asyncio.gather(*(quiz_chunk(c, n) for c, n in jobs), return_exceptions=True)
+
+    questions = []
+    errors = []
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"WARNING: Chunk generation failed: {result}")
+            errors.append(result)
+        else:
+            questions.extend(result)
+
+    if errors and len(errors) == len(results):
+        raise errors[0]
+    return _dedupe_questions(questions)[:num_questions]
+
+
+def _truncate_source(source_text: str, source_chars: int) -> str:
+    long_documents.inc(mode="truncate")
+    cut = source_text.rfind(" ", 0, source_chars)
+    return source_text[:cut if cut > 0 else source_chars] + "\n\n[TRUNCATED]"
+
+
+@metrics.timed("llm.compress")
+def compress_source(source_text: str, source_chars: int) -> str:
+    """
+    Shorten source_text to at most source_chars by keeping its most salient,
+    non-redundant sentences (TF-IDF maximal marginal relevance) in their
+    original order and paragraphs, so the whole document stays represented
+    """
+    sentences = []
+    paragraph_of = []
+    for p, paragraph in enumerate(_PARAGRAPH_RE.split(source_text)):
+        for sentence in preprocessing.preprocess_text(paragraph):
+            sentences.append(sentence)
+            paragraph_of.append(p)
+
+    # One separator character after every sentence
+    selected = algorithms.select_sentences_mmr(
+        sentences, [len(s) + 1 for s in sentences], source_chars, max_features=COMPRESSION_MAX_FEATURES
+    )
+    if not selected:
+        return _truncate_source(source_text, source_chars)
+
+    paragraphs = []
+    for i in selected:
+        if paragraphs and paragraph_of[i] == paragraph_of[paragraphs[-1][-1]]:
+            paragraphs[-1].append(i)
+        else:
+            paragraphs.append([i])
+    compressed = "\n\n".join(" ".join(sentences[i] for i in group) for group in paragraphs)
+
+    long_documents.inc(mode="compress")
+    return compressed
+
+
+def _long_document_mode(source_length: int, source_chars: int) -> Optional[str]:
+    """How a source of source_length chars is handled, None when it fits as is"""
+    if source_length <= source_chars:
+        return None
+    if LONG_DOCUMENT_MODE == "auto":
+        return "compress" if source_length <= source_chars * LLM_COMPRESS_MAX_RATIO else "map_reduce"
+    return LONG_DOCUMENT_MODE
+
+
+def _single_request(source_text, source_chars, num_questions, question_types, difficulty, model):
+    """Messages and max_tokens of a one-request quiz, shortening the source to source_chars"""
+    type_str = ", ".join(question_types) if question_types else "any type"
+
+    # Prevent context-size overflow errors
+    mode = _long_document_mode(len(source_text), source_chars)
+    if mode == "compress":
+        source_text = compress_source(source_text, source_chars)
+    elif mode is not None:
+        source_text = _truncate_source(source_text, source_chars)
+
+    messages = _build_messages(source_text, num_questions, type_str, difficulty)
+    return messages, tokens.completion_budget(model, num_questions, question_types)
+
+
+async def agenerate_from_llm(
+    source_text: str,
+    num_questions: int = 5,
+    question_types: Optional[List[str]] = None,
+    difficulty: str = None,
+    use_cache: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+) -> List[Question]:
+    """
+    Generates a quiz using Groq LLM with context-size protection.
+    Ensures oversized source text does NOT break the API.
+    use_cache=False asks the model again instead of reusing a cached response.
+    Must run on the loop from _get_loop, so callers on another loop wrap it
+    in run_on_loop.
+    """
+    if question_types is None:
+        question_types = []
+
+    model = DEFAULT_MODEL
+    source_chars = source_char_budget(model, num_questions, question_types, difficulty)
+
+    if _long_document_mode(len(source_text), source_chars) == "map_reduce":
+        return await agenerate_long_document(
+            source_text, num_questions, question_types, difficulty, source_chars,
+            model=model, use_cache=use_cache, priority=priority,
+        )
+
+    # Compressing a long source is CPU work, kept off the event loop
+    messages, max_tokens = await asyncio.to_thread(
+        _single_request, source_text, source_chars, num_questions, question_types, difficulty, model
     )
+    raw_response = await achat_completion(messages, model=model, max_tokens=max_tokens, use_cache=use_cache,
+                                          priority=priority)
     return _parse_questions(raw_response)
 
+
+def generate_from_llm(source_text: str, num_questions: int = 5, question_types: Optional[List[str]] = None,
+                      difficulty: str = None, use_cache: bool = True,
+                      priority: int = PRIORITY_INTERACTIVE) -> List[Question]:
+    """Blocking agenerate_from_llm, for callers without an event loop"""
+    return run_async(agenerate_from_llm(source_text, num_questions, question_types, difficulty, use_cache, priority))
+
+
+async def agenerate_from_llm_stream(
+    source_text: str,
+    num_questions: int = 5,
+    question_types: Optional[List[str]] = None,
+    difficulty: str = None,
+    use_cache: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+):
+    """
+    Streaming agenerate_from_llm: yields the list of questions parsed so far
+    every time another question completes, then the final list. Must run on
+    the loop from _get_loop, so callers on another loop wrap it in
+    iterate_on_loop.
+    """
+    if question_types is None:
+        question_types = []
+
+    model = DEFAULT_MODEL
+    source_chars = source_char_budget(model, num_questions, question_types, difficulty)
+
+    if _long_document_mode(len(source_text), source_chars) == "map_reduce":
+        # Chunk requests run concurrently, their questions arrive together
+        yield await agenerate_long_document(
+            source_text, num_questions, question_types, difficulty, source_chars,
+            model=model, use_cache=use_cache, priority=priority,
+        )
+        return
+
+    # Compressing a long source is CPU work, kept off the event loop
+    messages, max_tokens = await asyncio.to_thread(
+        _single_request, source_text, source_chars, num_questions, question_types, difficulty, model
+    )
+    parser = QuestionStreamParser()
+    questions = []
+    async for delta in astream_chat_completion(messages, model=model, max_tokens=max_tokens, use_cache=use_cache,
+                                               priority=priority):
+        completed = parser.feed(delta)
+        if completed:
+            questions.extend(completed)
+            yield list(questions)
+
+    # The complete response is authoritative when it parses
+    yield _parse_questions(parser.buffer) or questions
+
+
+def generate_from_llm_stream(source_text: str, num_questions: int = 5, question_types: Optional[List[str]] = None,
+                             difficulty: str = None, use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE):
+    """Blocking agenerate_from_llm_stream, for callers without an event loop"""
+    return iterate_sync(agenerate_from_llm_stream(source_text, num_questions, question_types, difficulty,
+                                                  use_cache, priority))
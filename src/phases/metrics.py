@@ -0,0 +1,351 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Print one JSON line per quiz request with its per-stage timings
+REQUEST_LOG = os.getenv("QUIZ_REQUEST_LOG", "1") != "0"
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = [*zip(labelnames, key), *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, registry, name: str, help: str, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.registry._capture('counter', self.name, labels, amount)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    def __init__(self, registry, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+        self.registry._capture('histogram', self.name, labels, value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip([*self.buckets, "+Inf"], series[:-1]):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", bound)])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms of this process, rendered in the Prometheus text
+    format along with the values of registered collectors.
+
+    CPU pool workers capture what they record and send it back with each
+    result (see executors.run_cpu), so the server's registry covers the
+    work done in every process.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._captured = None
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._metrics.setdefault(name, Counter(self, name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(self, name, help, labelnames, buckets))
+
+    def register_collector(self, collect):
+        """
+        Add collect(), called on every render. It returns a list of
+        (name, type, help, [(labels dict, value), ...]) families, e.g. the
+        counters of a cache's stats().
+        """
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"WARNING: Metrics collector failed: {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {kind}"])
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f"{name}{_format_labels(names, _label_key(names, labels))} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def capture(self):
+        """Start keeping every recorded value so drain() can hand them to another process"""
+        with self._lock:
+            self._captured = []
+
+    def _capture(self, kind, name, labels, value):
+        if self._captured is not None:
+            with self._lock:
+                self._captured.append((kind, name, labels, value))
+
+    def drain(self):
+        """Values recorded since the last drain (only while capturing)"""
+        with self._lock:
+            captured = self._captured or []
+            if self._captured is not None:
+                self._captured = []
+        return captured
+
+    def replay(self, captured):
+        """Record values drained in another process, and their spans in the current request"""
+        for kind, name, labels, value in captured:
+            metric = self._metrics.get(name)
+            if metric is None:
+                continue
+            if kind == 'counter':
+                metric.inc(value, **labels)
+            else:
+                metric.observe(value, **labels)
+                if metric is stage_seconds:
+                    request = _current_request.get()
+                    if request is not None:
+                        request.add(labels['stage'], value)
+
+
+# Process-wide registry
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "quiz_stage_seconds", "Time spent in each stage of the quiz pipeline", ["stage"])
+stage_errors = registry.counter(
+    "quiz_stage_errors_total", "Stages that raised an exception", ["stage"])
+request_seconds = registry.histogram(
+    "quiz_request_seconds", "End-to-end time of quiz requests", ["endpoint", "gen_type"])
+requests_total = registry.counter(
+    "quiz_requests_total", "Quiz requests by outcome", ["endpoint", "gen_type", "status"])
+
+_current_request = contextvars.ContextVar("quiz_request", default=None)
+
+
+def record_span(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage=stage)
+    request = _current_request.get()
+    if request is not None:
+        request.add(stage, seconds)
+
+
+def count(name: str, amount: float = 1):
+    """Add amount to a count (e.g. tokens or retries) in the log line of the current request"""
+    request = _current_request.get()
+    if request is not None:
+        request.count(name, amount)
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as one run of stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        record_span(stage, time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """Decorator timing every call of a function as stage"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RequestLog:
+    """Per-stage timings of one quiz request, logged as one JSON line when it finishes"""
+
+    def __init__(self, endpoint: str, **fields):
+        self.id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.fields = fields
+        self.status = 'ok'
+        self.stages = {}
+        self.counts = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def first_question(self):
+        """Note the time to the first streamed question (only the first call counts)"""
+        self.fields.setdefault('first_question_ms', round(self.elapsed() * 1000, 2))
+
+    def count(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            total, calls = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, calls + 1)
+
+    def finish(self, status: str = None, **fields):
+        status = status or self.status
+        seconds = self.elapsed()
+        gen_type = self.fields.get('gen_type', '')
+        request_seconds.observe(seconds, endpoint=self.endpoint, gen_type=gen_type)
+        requests_total.inc(endpoint=self.endpoint, gen_type=gen_type, status=status)
+
+        if REQUEST_LOG:
+            with self._lock:
+                stages = {stage: {'ms': round(total * 1000, 2), 'calls': calls} for stage, (total, calls) in self.stages.items()}
+                counts = dict(self.counts)
+            print(json.dumps({
+                'event': 'quiz_request',
+                'request_id': self.id,
+                'endpoint': self.endpoint,
+                **self.fields,
+                **fields,
+                'status': status,
+                'ms': round(seconds * 1000, 2),
+                'stages': stages,
+                **({'counts': counts} if counts else {}),
+            }, default=str), flush=True)
+
+
+@contextmanager
+def attach(log: RequestLog):
+    """Collect the spans of the enclosed block (which must not contain a yield) into log"""
+    token = _current_request.set(log)
+    try:
+        yield log
+    finally:
+        _current_request.reset(token)
+
+
+@contextmanager
+def request(endpoint: str, **fields):
+    """
+    Collect the spans of the enclosed block (on this thread or task) into a
+    RequestLog; set log.status to report an error that was handled inside
+    """
+    log = RequestLog(endpoint, **fields)
+    try:
+        with attach(log):
+            yield log
+    except Exception:
+        if log.status == 'ok':
+            log.status = 'error'
+        raise
+    finally:
+        log.finish()
+
+
+async def timed_iter(iterable, log: RequestLog, stage: str):
+    """
+    Iterate the async iterable, adding the time spent waiting for its items
+    (not the consumer's time between them) to log as one run of stage
+    """
+    waited = 0.0
+    iterator = iterable.__aiter__()
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                waited += time.perf_counter() - start
+            yield item
+    finally:
+        log.add(stage, waited)
+
+
+def stats_collector(prefix: str, help: str, stats, counters=()):
+    """
+    Collector for register_collector exposing the numeric fields of a
+    stats() dict: prefix_<field>_total counters for the fields named in
+    counters, prefix_<field> gauges for the rest
+    """
+    def collect():
+        families = []
+        for field, value in stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if field in counters:
+                families.append((f"{prefix}_{field}_total", "counter", f"{help} ({field})", [({}, value)]))
+            else:
+                families.append((f"{prefix}_{field}", "gauge", f"{help} ({field})", [({}, value)]))
+        return families
+    return collect
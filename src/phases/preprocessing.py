@@ -1,17 +1,44 @@
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import sent_tokenize
+import threading
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+from . import metrics, startup
+from .startup import lazy_import
 
+NLTK_DATA_TASK = "NLTK data"
+
+_nltk_ready = False
+_nltk_lock = threading.Lock()
+
+def ensure_nltk_data():
+    """Import NLTK and download its tokenizer/stopword data once, on first use"""
+    global _nltk_ready
+
+    if _nltk_ready:
+        return
+    with _nltk_lock:
+        if _nltk_ready:
+            return
+        nltk = lazy_import("nltk")
+        with startup.timed(NLTK_DATA_TASK, "model"):
+            for resource, package in [('tokenizers/punkt', 'punkt'), ('corpora/stopwords', 'stopwords')]:
+                try:
+                    nltk.data.find(resource)
+                except LookupError:
+                    nltk.download(package)
+        _nltk_ready = True
+        startup.mark_ready(NLTK_DATA_TASK)
+
+@metrics.timed("preprocessing")
 def preprocess_text(text):
     """Clean and preprocess text"""
-    sentences = sent_tokenize(text)
+    ensure_nltk_data()
+    sentences = lazy_import("nltk.tokenize").sent_tokenize(text)
     return sentences
 
+def tokenize_words(text):
+    ensure_nltk_data()
+    return lazy_import("nltk.tokenize").word_tokenize(text)
+
 def get_stop_words():
-    stop_words = set(stopwords.words('english'))
+    ensure_nltk_data()
+    stop_words = set(lazy_import("nltk.corpus").stopwords.words('english'))
     return stop_words
@@ -1,23 +1,15 @@
 import random
-import re
 
-from . import preprocessing, algorithms
+from . import distractors, metrics
+from .analysis import DocumentAnalysis, keyword_pattern
 
-def find_similar_words(word_model, word, top_n=5):
-    """Find similar words using word embeddings"""
-    if word_model is None:
-        return []
-    
-    try:
-        similar = word_model.wv.most_similar(word.lower(), topn=top_n)
-        return [w for w, score in similar]
-    except:
-        return []
-
-def generate_fill_blank_questions(text, n_questions=5):
+@metrics.timed("question_types.generate_fill_blank_questions")
+def generate_fill_blank_questions(text, n_questions=5, analysis=None):
     """Generate fill-in-the-blank questions using keywords"""
-    sentences = preprocessing.preprocess_text(text)
-    keywords = algorithms.extract_keywords_tfidf(text, top_n=20)
+    analysis = analysis or DocumentAnalysis(text)
+    sentences = analysis.sentences
+    index = analysis.index
+    keywords = analysis.keywords
     
     questions = []
     used_sentences = set()
@@ -26,74 +18,85 @@ def generate_fill_blank_questions(text, n_questions=5):
         if len(questions) >= n_questions:
             break
         
-        for i, sentence in enumerate(sentences):
-            if i in used_sentences:
-                continue
-            
-            # Check if keyword appears in sentence (case insensitive)
-            pattern = r'\b' + re.escape(keyword) + r'\b'
-            if re.search(pattern, sentence, re.IGNORECASE):
-                # Create blank
-                blanked = re.sub(pattern, '_____', sentence, count=1, flags=re.IGNORECASE)
-                questions.append({
-                    'question': blanked,
-                    'answer': keyword,
-                    'type': 'fill_blank'
-                })
-                used_sentences.add(i)
-                break
+        # Find first unused sentence containing the keyword (case insensitive)
+        i = index.first(keyword, skip=used_sentences)
+        if i is None:
+            continue
+        
+        # Create blank
+        blanked = keyword_pattern(keyword).sub('_____', sentences[i], count=1)
+        questions.append({
+            'question': blanked,
+            'answer': keyword,
+            'type': 'fill_blank'
+        })
+        used_sentences.add(i)
     
     return questions
 
-def generate_mcq_questions(text, n_questions=5):
-    """Generate multiple choice questions using NER and embeddings"""
-    entities = algorithms.extract_entities_ner(text)
-    word_model = algorithms.train_word_embeddings(text)
-    sentences = preprocessing.preprocess_text(text)
+@metrics.timed("question_types.generate_mcq_questions")
+def generate_mcq_questions(text, n_questions=5, analysis=None):
+    """Generate multiple choice questions using NER and prebuilt word vectors"""
+    analysis = analysis or DocumentAnalysis(text)
+    entities = analysis.entities
+    sentences = analysis.sentences
+    index = analysis.index
     
-    questions = []
+    # Pick the entities to ask about, with the sentence containing each
+    selected = []
     used_entities = set()
     
     for entity in entities:
-        if len(questions) >= n_questions:
+        if len(selected) >= n_questions:
             break
         
         if entity['text'] in used_entities:
             continue
         
         # Find sentence containing this entity
-        for sentence in sentences:
-            if entity['text'] in sentence:
-                # Generate distractors
-                distractors = find_similar_words(word_model, entity['text'], top_n=3)
-                
-                # If not enough similar words, use other entities
-                if len(distractors) < 3:
-                    other_entities = [e['text'] for e in entities 
-                                    if e['text'] != entity['text'] and e['label'] == entity['label']]
-                    distractors.extend(other_entities[:3-len(distractors)])
-                
-                # Ensure we have exactly 3 distractors
-                if len(distractors) < 3:
-                    distractors.extend(['Option ' + str(i) for i in range(3-len(distractors))])
-                
-                options = [entity['text']] + distractors[:3]
-                random.shuffle(options)
-                
-                questions.append({
-                    'question': f"In the context: '{sentence}'\nWhat is the {entity['label'].lower()} mentioned?",
-                    'options': options,
-                    'answer': entity['text'],
-                    'type': 'mcq'
-                })
-                used_entities.add(entity['text'])
-                break
+        i = index.first(entity['text'], match_case=True)
+        if i is None:
+            continue
+        
+        selected.append((entity, sentences[i]))
+        used_entities.add(entity['text'])
+    
+    # Generate distractors for all answers in one batched vector search
+    vectors = distractors.get_distractor_index()
+    similar = vectors.most_similar([e['text'] for e, _ in selected], top_n=3) if vectors else {}
+    
+    questions = []
+    for entity, sentence in selected:
+        options_pool = list(similar.get(entity['text'], []))
+        
+        # If not enough similar words, use other entities
+        if len(options_pool) < 3:
+            other_entities = [e['text'] for e in entities 
+                            if e['text'] != entity['text'] and e['label'] == entity['label']
+                            and e['text'] not in options_pool]
+            options_pool.extend(dict.fromkeys(other_entities))
+        
+        # Ensure we have exactly 3 distractors
+        if len(options_pool) < 3:
+            options_pool.extend(['Option ' + str(i) for i in range(3-len(options_pool))])
+        
+        options = [entity['text']] + options_pool[:3]
+        random.shuffle(options)
+        
+        questions.append({
+            'question': f"In the context: '{sentence}'\nWhat is the {entity['label'].lower()} mentioned?",
+            'options': options,
+            'answer': entity['text'],
+            'type': 'mcq'
+        })
     
     return questions
 
-def generate_topic_questions(text, n_questions=3):
-    """Generate questions based on LDA topics"""
-    topics = algorithms.extract_topics_lda(text, n_topics=5)
+@metrics.timed("question_types.generate_topic_questions")
+def generate_topic_questions(text, n_questions=3, analysis=None):
+    """Generate questions based on the topics of text"""
+    analysis = analysis or DocumentAnalysis(text)
+    topics = analysis.get_topics(n_topics=5)
     
     questions = []
     for i, topic_words in enumerate(topics[:n_questions]):
@@ -106,10 +109,13 @@ def generate_topic_questions(text, n_questions=3):
     
     return questions
 
-def generate_true_false_questions(text, n_questions=5):
-    sentences = preprocessing.preprocess_text(text)
-    entities = algorithms.extract_entities_ner(text)
-    keywords = algorithms.extract_keywords_tfidf(text, top_n=20)
+@metrics.timed("question_types.generate_true_false_questions")
+def generate_true_false_questions(text, n_questions=5, analysis=None):
+    analysis = analysis or DocumentAnalysis(text)
+    sentences = analysis.sentences
+    index = analysis.index
+    entities = analysis.entities
+    keywords = analysis.keywords
     
     questions = []
     used_sentences = set()
@@ -119,64 +125,63 @@ def generate_true_false_questions(text, n_questions=5):
         if len(questions) >= n_questions:
             break
         
-        for i, sentence in enumerate(sentences):
-            if i in used_sentences:
-                continue
+        i = index.first(entity['text'], skip=used_sentences, match_case=True)
+        if i is None:
+            continue
+        sentence = sentences[i]
+        
+        # Create a TRUE question from the original sentence
+        questions.append({
+            'question': sentence,
+            'answer': 'True',
+            'explanation': f"This statement is directly from the text.",
+            'type': 't/f'
+        })
+        used_sentences.add(i)
+        
+        # Optionally create a FALSE question by replacing the entity
+        if len(questions) < n_questions:
+            # Find a different entity of the same type for replacement
+            other_entities = [e['text'] for e in entities 
+                            if e['text'] != entity['text'] and e['label'] == entity['label']]
             
-            if entity['text'] in sentence:
-                # Create a TRUE question from the original sentence
+            if other_entities:
+                false_sentence = sentence.replace(entity['text'], other_entities[0], 1)
                 questions.append({
-                    'question': sentence,
-                    'answer': 'True',
-                    'explanation': f"This statement is directly from the text.",
+                    'question': false_sentence,
+                    'answer': 'False',
+                    'explanation': f"The text actually mentions '{entity['text']}', not '{other_entities[0]}'.",
                     'type': 't/f'
                 })
-                used_sentences.add(i)
-                
-                # Optionally create a FALSE question by replacing the entity
-                if len(questions) < n_questions:
-                    # Find a different entity of the same type for replacement
-                    other_entities = [e['text'] for e in entities 
-                                    if e['text'] != entity['text'] and e['label'] == entity['label']]
-                    
-                    if other_entities:
-                        false_sentence = sentence.replace(entity['text'], other_entities[0], 1)
-                        questions.append({
-                            'question': false_sentence,
-                            'answer': 'False',
-                            'explanation': f"The text actually mentions '{entity['text']}', not '{other_entities[0]}'.",
-                            'type': 't/f'
-                        })
-                break
     
     # Strategy 2: Create statements with keyword substitution for remaining questions
     for keyword in keywords:
         if len(questions) >= n_questions:
             break
         
-        for i, sentence in enumerate(sentences):
-            if i in used_sentences:
-                continue
-            
-            pattern = r'\b' + re.escape(keyword) + r'\b'
-            if re.search(pattern, sentence, re.IGNORECASE):
-                # TRUE question
-                questions.append({
-                    'question': sentence,
-                    'answer': 'True',
-                    'explanation': 'This statement is from the original text.',
-                    'type': 't/f'
-                })
-                used_sentences.add(i)
-                break
+        i = index.first(keyword, skip=used_sentences)
+        if i is None:
+            continue
+        
+        # TRUE question
+        questions.append({
+            'question': sentences[i],
+            'answer': 'True',
+            'explanation': 'This statement is from the original text.',
+            'type': 't/f'
+        })
+        used_sentences.add(i)
     
     return questions[:n_questions]
 
 
-def generate_short_answer_questions(text, n_questions=5):
-    sentences = preprocessing.preprocess_text(text)
-    keywords = algorithms.extract_keywords_tfidf(text, top_n=20)
-    entities = algorithms.extract_entities_ner(text)
+@metrics.timed("question_types.generate_short_answer_questions")
+def generate_short_answer_questions(text, n_questions=5, analysis=None):
+    analysis = analysis or DocumentAnalysis(text)
+    sentences = analysis.sentences
+    index = analysis.index
+    keywords = analysis.keywords
+    entities = analysis.entities
     
     questions = []
     used_sentences = set()
@@ -196,31 +201,29 @@ def generate_short_answer_questions(text, n_questions=5):
             break
         
         # Find sentence containing the keyword
-        for i, sentence in enumerate(sentences):
-            if i in used_sentences:
-                continue
-            
-            pattern = r'\b' + re.escape(keyword) + r'\b'
-            if re.search(pattern, sentence, re.IGNORECASE):
-                # Choose appropriate question template
-                template_type = random.choice(question_templates)
-                question_word, question_format, _ = template_type
-                
-                # Create question
-                question_text = question_format.format(keyword=keyword)
-                
-                # Extract answer from sentence (use the sentence as context)
-                # For short answer, the answer should be concise
-                answer = _extract_answer_from_sentence(sentence, keyword)
-                
-                questions.append({
-                    'question': question_text,
-                    'answer': answer,
-                    'context': sentence,
-                    'type': 'short_answer'
-                })
-                used_sentences.add(i)
-                break
+        i = index.first(keyword, skip=used_sentences)
+        if i is None:
+            continue
+        sentence = sentences[i]
+        
+        # Choose appropriate question template
+        template_type = random.choice(question_templates)
+        question_word, question_format, _ = template_type
+        
+        # Create question
+        question_text = question_format.format(keyword=keyword)
+        
+        # Extract answer from sentence (use the sentence as context)
+        # For short answer, the answer should be concise
+        answer = _extract_answer_from_sentence(sentence, keyword)
+        
+        questions.append({
+            'question': question_text,
+            'answer': answer,
+            'context': sentence,
+            'type': 'short_answer'
+        })
+        used_sentences.add(i)
     
     # Strategy 2: Generate questions based on entities
     entity_question_templates = {
@@ -237,29 +240,28 @@ def generate_short_answer_questions(text, n_questions=5):
             break
         
         # Find sentence containing the entity
-        for i, sentence in enumerate(sentences):
-            if i in used_sentences:
-                continue
-            
-            if entity['text'] in sentence:
-                # Get appropriate question template for entity type
-                question_template = entity_question_templates.get(
-                    entity['label'], 
-                    "What is {entity}?"
-                )
-                question_text = question_template.format(entity=entity['text'])
-                
-                # Use the sentence as the answer
-                answer = sentence
-                
-                questions.append({
-                    'question': question_text,
-                    'answer': answer,
-                    'context': sentence,
-                    'type': 'short_answer'
-                })
-                used_sentences.add(i)
-                break
+        i = index.first(entity['text'], skip=used_sentences, match_case=True)
+        if i is None:
+            continue
+        sentence = sentences[i]
+        
+        # Get appropriate question template for entity type
+        question_template = entity_question_templates.get(
+            entity['label'], 
+            "What is {entity}?"
+        )
+        question_text = question_template.format(entity=entity['text'])
+        
+        # Use the sentence as the answer
+        answer = sentence
+        
+        questions.append({
+            'question': question_text,
+            'answer': answer,
+            'context': sentence,
+            'type': 'short_answer'
+        })
+        used_sentences.add(i)
     
     return questions[:n_questions]
 
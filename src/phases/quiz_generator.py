@@ -1,50 +1,144 @@
 import os
-from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
-from sklearn.feature_extraction.text import TfidfVectorizer
+import re
+import threading
+import numpy as np
+
+from . import ingestion, metrics, startup
+from .algorithms import top_k_indices
+from .startup import lazy_import
+from .topics import TopicModel
+
+MODEL_NAME = "google/flan-t5-base"
+MODEL_TASK = "flan-t5 explanations"
+
+# How flan-t5 runs on CPU: 'torch' (fp32), 'int8' (dynamically quantized
+# linear layers) or 'onnx' (ONNX Runtime export, needs optimum[onnxruntime])
+T5_RUNTIME = os.getenv("QUIZ_T5_RUNTIME", "torch")
+T5_RUNTIMES = ('torch', 'int8', 'onnx')
+
+# torch intra-op threads for inference, 0 keeps torch's default
+TORCH_THREADS = int(os.getenv("QUIZ_TORCH_THREADS", "0"))
+
+# Prompts per forward pass when explaining every question of a quiz
+EXPLAIN_BATCH_SIZE = int(os.getenv("QUIZ_EXPLAIN_BATCH_SIZE", "8"))
+
+_QUESTION_START_RE = re.compile(r'^(\d+\s*[.)]|question\b)', re.IGNORECASE)
 
 
 class QuizAI:
-    def __init__(self):
+    def __init__(self, model_name: str = MODEL_NAME, runtime: str = None):
         self.documents = []
+        self.model_name = model_name
+        self.runtime = runtime or T5_RUNTIME
+        # Checked before anything is loaded, since the fp32 model alone takes a while
+        if self.runtime not in T5_RUNTIMES:
+            raise ValueError(f"Unknown T5 runtime '{self.runtime}', expected 'torch', 'int8' or 'onnx'.")
+        self.tokenizer = None
+        self.model = None
+        self._generator = None
+        self._load_lock = threading.Lock()
+
+        # Topics of all uploaded documents, updated online as they arrive
+        self.topic_model = None
 
-        # Load model
-        model_name = "google/flan-t5-base"
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    def load(self):
+        """
+        Load the model and text generation pipeline once.
+        Called by the background warm-up, or on first use if that hasn't finished.
+        """
+        if self._generator is not None:
+            return self._generator
 
-        # Text generation pipeline
-        self.generator = pipeline(
-            "text2text-generation",
-            model=self.model,
-            tokenizer=self.tokenizer,
-            max_new_tokens=200
-        )
+        with self._load_lock:
+            if self._generator is None:
+                transformers = lazy_import("transformers")
+                torch = lazy_import("torch")
+                if TORCH_THREADS > 0:
+                    torch.set_num_threads(TORCH_THREADS)
+
+                with startup.timed(f"{self.model_name} ({self.runtime})", "model"):
+                    # Load model
+                    self.tokenizer = transformers.AutoTokenizer.from_pretrained(self.model_name)
+                    self.model = self._load_model(transformers, torch)
+
+                    # Text generation pipeline
+                    self._generator = transformers.pipeline(
+                        "text2text-generation",
+                        model=self.model,
+                        tokenizer=self.tokenizer,
+                        max_new_tokens=200
+                    )
+                startup.mark_ready(MODEL_TASK)
+        return self._generator
+
+    def _load_model(self, transformers, torch):
+        """Seq2seq model for the configured runtime, falling back to fp32 torch"""
+        if self.runtime == 'onnx':
+            try:
+                onnxruntime = lazy_import("optimum.onnxruntime")
+                return onnxruntime.ORTModelForSeq2SeqLM.from_pretrained(self.model_name, export=True)
+            except ImportError as e:
+                print(f"WARNING: ONNX runtime unavailable ({e}), install optimum[onnxruntime]; using torch")
+                self.runtime = 'torch'
+
+        model = transformers.AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
+        model.eval()
+        if self.runtime == 'int8':
+            # Weights of every Linear layer in int8, activations quantized on the fly
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    @property
+    def generator(self):
+        return self.load()
+
+    def run_generator(self, inputs, **kwargs):
+        """Call the pipeline without autograd bookkeeping"""
+        generator = self.generator
+        with metrics.span("t5"), lazy_import("torch").inference_mode():
+            return generator(inputs, **kwargs)
+
+    @property
+    def is_ready(self):
+        return self._generator is not None
 
     def upload_document(self, file_path):
-        """Read and save uploaded text file"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        self.documents.append(content)
-        return "Document uploaded successfully!"
+        """Stream and save uploaded text file"""
+        upload = ingestion.ingest(file_path)
+        self.documents.append(upload['text'])
+
+        if self.topic_model is None:
+            self.topic_model = TopicModel()
+        self.topic_model.partial_fit(upload['sentences'])
+
+        message = "Document uploaded successfully!"
+        if upload['truncated']:
+            message += f" Only the first {len(upload['text'])} characters were kept."
+        return message
 
     def detect_material(self):
         """Extract top 5 keyword topics using TF-IDF"""
         if not self.documents:
             return "No document uploaded."
 
+        TfidfVectorizer = lazy_import("sklearn.feature_extraction.text").TfidfVectorizer
         vectorizer = TfidfVectorizer(stop_words='english')
         X = vectorizer.fit_transform(self.documents)
 
         feature_names = vectorizer.get_feature_names_out()
-        scores = X.toarray().sum(axis=0)
+        scores = np.asarray(X.sum(axis=0)).ravel()
 
-        top_indices = scores.argsort()[::-1][:5]
+        top_indices = top_k_indices(scores, 5)
         keywords = [feature_names[i] for i in top_indices]
 
-        return f"Detected material keywords: {', '.join(keywords)}"
+        result = f"Detected material keywords: {', '.join(keywords)}"
+
+        topics = self.topic_model.topics() if self.topic_model is not None else []
+        if topics:
+            result += "\nDetected topics: " + "; ".join(", ".join(words[:3]) for words in topics)
+        return result
 
     def generate_quiz(self):
-        print("hi")
         """Generate 5 multiple-choice questions"""
         if not self.documents:
             return ""
@@ -71,7 +165,8 @@ c) option
 d) option
         """
 
-        output = self.generator(prompt)[0]["generated_text"]
+        with metrics.request("t5_quiz"):
+            output = self.run_generator(prompt)[0]["generated_text"]
         return output
 
     
@@ -96,11 +191,22 @@ d) option
 
         return "\n".join(first_q)
 
-    def generate_explanations(self, quiz_text):
-        """Generate explanation for the correct answer of the first question"""
-        question = self.extract_first_question(quiz_text)
+    def extract_questions(self, quiz_text):
+        """Split a generated quiz into its question blocks (question line plus options)"""
+        blocks = []
+        current = None
 
-        prompt = f"""
+        for line in quiz_text.strip().split("\n"):
+            if _QUESTION_START_RE.match(line.strip()):
+                current = [line]
+                blocks.append(current)
+            elif current is not None and line.strip():
+                current.append(line)
+
+        return ["\n".join(block) for block in blocks]
+
+    def _explanation_prompt(self, question):
+        return f"""
 Explain the correct answer to the following multiple-choice question.
 Only give the explanation.
 
@@ -110,5 +216,46 @@ Question:
 Provide a short and clear explanation.
 """
 
-        output = self.generator(prompt)[0]["generated_text"]
+    def explain_questions(self, questions, batch_size: int = EXPLAIN_BATCH_SIZE):
+        """
+        Explanations for a list of questions, in the same order, generated in
+        batches. Prompts are sorted by token length first so each batch pads
+        to similar lengths.
+        """
+        if not questions:
+            return []
+
+        self.load()
+        prompts = [self._explanation_prompt(q) for q in questions]
+        lengths = [len(ids) for ids in self.tokenizer(prompts)["input_ids"]]
+        order = sorted(range(len(prompts)), key=lambda i: lengths[i])
+
+        outputs = self.run_generator([prompts[i] for i in order], batch_size=batch_size)
+
+        explanations = [None] * len(prompts)
+        for i, output in zip(order, outputs):
+            # Pipelines return a list per input when given a list
+            if isinstance(output, list):
+                output = output[0]
+            explanations[i] = output["generated_text"]
+        return explanations
+
+    def generate_explanations(self, quiz_text, explain_all: bool = False):
+        """
+        Generate explanation for the correct answer of the first question,
+        or of every question with explain_all
+        """
+        with metrics.request("t5_explain", explain_all=explain_all):
+            return self._generate_explanations(quiz_text, explain_all)
+
+    def _generate_explanations(self, quiz_text, explain_all: bool):
+        if explain_all:
+            questions = self.extract_questions(quiz_text)
+            explanations = self.explain_questions(questions)
+            return "\n\n".join(
+                f"Question {n}: {explanation}" for n, explanation in enumerate(explanations, start=1)
+            )
+
+        question = self.extract_first_question(quiz_text)
+        output = self.run_generator(self._explanation_prompt(question))[0]["generated_text"]
         return output
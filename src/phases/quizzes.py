@@ -1,126 +1,373 @@
+import asyncio
 import csv
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import StringIO
+import multiprocessing
+import os
 import random
 import re
+import shutil
+import tempfile
+import threading
 import gradio as gr
 from . import question_types as q_types
 from . import algorithms
+from . import distractors
+from . import executors
+from . import ingestion
 from . import llm_client
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER
+from . import metrics
+from .analysis import DocumentAnalysis
 
 difficulties = ["easy", "medium", "hard"]
 
+# How the selected question types are generated: 'serial' (one after another),
+# 'thread' or 'process' (every type at once on a shared pool of workers)
+GENERATION_EXECUTOR = os.getenv("QUIZ_GENERATION_EXECUTOR", "serial")
+GENERATION_WORKERS = int(os.getenv("QUIZ_GENERATION_WORKERS", "4"))
+
+# Seconds a browser session's quiz state is kept after its last change
+SESSION_TTL = float(os.getenv("QUIZ_SESSION_TTL", "3600"))
+
+_generators = {
+    'fill_blank': q_types.generate_fill_blank_questions,
+    'mcq': q_types.generate_mcq_questions,
+    't/f': q_types.generate_true_false_questions,
+    'short_answer': q_types.generate_short_answer_questions,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _forget_executor():
+    # A pool forked from the parent has none of its threads or processes
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_executor)
+
+
+def get_generation_executor():
+    """
+    Shared pool for question generation, None in serial mode. Inside a CPU
+    pool worker (where local generation runs by default) the types fan out
+    on threads of that worker rather than on further processes.
+    """
+    global _executor
+
+    if GENERATION_EXECUTOR not in ('thread', 'process'):
+        return None
+    with _executor_lock:
+        if _executor is None:
+            if GENERATION_EXECUTOR == 'process' and not executors.in_cpu_worker():
+                # fork shares the already imported libraries with the workers;
+                # spawn would re-import the app module in every worker
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+                _executor = ProcessPoolExecutor(max_workers=GENERATION_WORKERS, mp_context=context)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="quiz-gen")
+    return _executor
+
+
+def new_quiz_state():
+    """Empty quiz state of one browser session (the value of its gr.State)"""
+    return {
+        'input_text': '',
+        'markdown_result': '',
+        'analysis': None,
+        'questions': [],
+        'num_questions': 0,
+        'question_types': [],
+        'difficulty': None,
+        'download_dir': None,
+    }
+
+
+def discard_quiz_state(state):
+    """Delete the download files of a session that was closed or expired"""
+    if state and state.get('download_dir'):
+        shutil.rmtree(state['download_dir'], ignore_errors=True)
+
+
 class Quiz:
-    def __init__(self):
-        self.input_text = ''
-        self.markdown_result = ''
-        self.current_quiz_state = {
-            'questions': [],
-            'num_questions': 0,
-            'question_types': []
-        }
+    """
+    Quiz generation, formatting and export. Holds no per-user data: every
+    UI handler takes the session's quiz state and returns the updated state
+    as its last output, so one instance serves any number of sessions.
+    """
 
-# gen_type can be 'ai' or 'text'
-    def generate(self, gen_type: str, input: str, num_questions: int, question_types: list, difficulty: str):
+    def _check_inputs(self, gen_type: str, input: str, question_types: list, difficulty: str):
+        """Message explaining why the inputs can't be used, None if they are fine"""
         if not input or not input.strip():
-            return (
-                gr.update(visible=False),
-                gr.update(visible=False),
-                "Please provide text to generate questions from."
-            )
+            return "Please provide text to generate questions from."
         if not question_types:
-            return (
-                gr.update(visible=False),
-                gr.update(visible=False),
-                "Please select at least one question type."
-            )
+            return "Please select at least one question type."
         if difficulty not in difficulties and gen_type != "ai":
-            return (
-                gr.update(visible=False),
-                gr.update(visible=False),
-                f"Please select a valid difficulty ({difficulties})."
-            )
-        
+            return f"Please select a valid difficulty ({difficulties})."
+        return None
+
+    def _quiz_state(self, state: dict, input: str, all_questions: list, question_types: list, difficulty: str, analysis=None):
+        """New state holding a finished quiz; the session's download folder carries over"""
+        with metrics.span("formatting"):
+            markdown = self.format_markdown(all_questions, difficulty, len(all_questions))
+        return {
+            **new_quiz_state(),
+            'download_dir': state.get('download_dir') if state else None,
+            'input_text': input,
+            'markdown_result': markdown,
+            'analysis': analysis,
+            'questions': all_questions,
+            'num_questions': len(all_questions),
+            'question_types': question_types,
+            'difficulty': difficulty,
+        }
+
+    def _show_quiz(self, state: dict):
+        """Outputs that display the quiz of state"""
+        show_buttons = "0 questions" not in state['markdown_result']
+        return (
+            gr.update(visible=show_buttons),
+            gr.update(visible=show_buttons),
+            gr.Markdown(state['markdown_result']),
+            state
+        )
+
+    def show_result(self, state: dict, result: dict):
+        """Outputs that display a quiz saved without its analysis (e.g. a job result)"""
+        return self._show_quiz({**new_quiz_state(), **result, 'download_dir': state.get('download_dir')})
+
+    def show_error(self, state: dict, message: str):
+        """Outputs that show message instead of a quiz, keeping the session's quiz"""
+        return (
+            gr.update(visible=False),
+            gr.update(visible=False),
+            message,
+            state
+        )
+
+    def stages(self, gen_type: str, question_types: list):
+        """Names of the stages create goes through, in order (reported to its progress callback)"""
+        if gen_type == 'ai':
+            return ['llm', 'formatting']
+        return ['segmentation', 'ner', 'keywords'] + [t for t in question_types if t in _generators] + ['formatting']
+
+    def create(self, gen_type: str, input: str, num_questions: int, question_types: list, difficulty: str, sentences: list = None, use_cache: bool = True, progress=None):
+        """
+        Generate a quiz and return it as a new quiz state, without any UI.
+        progress(stage) is called as each of self.stages() begins.
+        Raises ValueError when the inputs can't be used.
+        """
+        error = self._check_inputs(gen_type, input, question_types, difficulty)
+        if error:
+            raise ValueError(error)
+
+        if gen_type == 'ai':
+            if progress:
+                progress('llm')
+            analysis = None
+            all_questions = self._generate_with_ai(input, num_questions, question_types, difficulty, use_cache)
+        else:
+            analysis = DocumentAnalysis(input, sentences=sentences)
+            if progress:
+                # Built up front (instead of on first use) so each step is reported
+                for stage, compute in [('segmentation', lambda: analysis.index), ('ner', lambda: analysis.entities),
+                                       ('keywords', lambda: analysis.keywords)]:
+                    progress(stage)
+                    compute()
+            all_questions = self._generate_from_text(input, num_questions, question_types, analysis, progress)
+
+        if progress:
+            progress('formatting')
+        return self._quiz_state(None, input, all_questions, question_types, difficulty, analysis)
+
+    async def acreate(self, gen_type: str, input: str, num_questions: int, question_types: list, difficulty: str, use_cache: bool = True, priority: int = llm_client.PRIORITY_INTERACTIVE):
+        """
+        Async create: local quizzes run on the CPU pool, and AI ones on the
+        LLM event loop without holding a thread while they wait. AI requests
+        are queued at priority.
+        """
+        if gen_type != 'ai':
+            return await asyncio.to_thread(executors.run_cpu, self.create, gen_type, input, num_questions, question_types, difficulty, None, use_cache)
+
+        error = self._check_inputs(gen_type, input, question_types, difficulty)
+        if error:
+            raise ValueError(error)
+        all_questions = await llm_client.run_on_loop(llm_client.agenerate_from_llm(
+            source_text=input,
+            num_questions=num_questions,
+            question_types=question_types,
+            difficulty=difficulty,
+            use_cache=use_cache,
+            priority=priority
+        ))
+        return self._quiz_state(None, input, all_questions, question_types, difficulty)
+
+# gen_type can be 'ai' or 'text'
+    def generate(self, state: dict, gen_type: str, input: str, num_questions: int, question_types: list, difficulty: str, sentences: list = None, use_cache: bool = True):
+        with metrics.request("generate", gen_type=gen_type, num_questions=num_questions) as log:
+            error = self._check_inputs(gen_type, input, question_types, difficulty)
+            if error:
+                log.status = 'invalid'
+                return self.show_error(state, error)
+
+            try:
+                if gen_type == 'ai':
+                    quiz = self.create(gen_type, input, num_questions, question_types, difficulty, sentences, use_cache)
+                else:
+                    # CPU-bound, so it runs on the process pool rather than a Gradio worker thread
+                    quiz = executors.run_cpu(self.create, gen_type, input, num_questions, question_types, difficulty, sentences, use_cache)
+                return self._show_quiz({**quiz, 'download_dir': state.get('download_dir')})
+            except Exception as e:
+                log.status = 'error'
+                return self.show_error(state, f"**Error generating questions:** {e}")
+
+    def generate_stream(self, state: dict, gen_type: str, input: str, num_questions: int, question_types: list, difficulty: str, sentences: list = None, use_cache: bool = True):
+        """
+        Generator version of generate for Gradio: AI quizzes are shown question
+        by question while the response streams in
+        """
+        if gen_type != 'ai':
+            yield self.generate(state, gen_type, input, num_questions, question_types, difficulty, sentences, use_cache)
+            return
+
+        error = self._check_inputs(gen_type, input, question_types, difficulty)
+        if error:
+            yield self.show_error(state, error)
+            return
+
+        # Logged without metrics.request: a generator's steps may run on different threads
+        log = metrics.RequestLog("generate_stream", gen_type=gen_type, num_questions=num_questions)
         try:
-            all_questions = self._generate_with_ai(input, num_questions, question_types, difficulty) if gen_type == 'ai' else self._generate_from_text(input, num_questions, question_types)
+            all_questions = []
+            for all_questions in llm_client.iterate_sync(metrics.timed_iter(llm_client.agenerate_from_llm_stream(
+                source_text=input,
+                num_questions=num_questions,
+                question_types=question_types,
+                difficulty=difficulty,
+                use_cache=use_cache
+            ), log, 'llm')):
+                log.first_question()
+                # The session keeps its previous quiz until this one is complete
+                yield (
+                    gr.update(visible=False),
+                    gr.update(visible=False),
+                    gr.Markdown(self.format_markdown(all_questions, difficulty, len(all_questions))),
+                    state
+                )
+            with metrics.attach(log):
+                quiz = self._quiz_state(state, input, all_questions, question_types, difficulty)
+            log.finish()
+            yield self._show_quiz(quiz)
+        except Exception as e:
+            log.finish('error')
+            yield self.show_error(state, f"**Error generating questions:** {e}")
 
-            self.input_text = input
-            self.current_quiz_state['questions'] = all_questions
-            self.current_quiz_state['num_questions'] = len(all_questions)
-            self.current_quiz_state['question_types'] = question_types
-            self.markdown_result = self.format_markdown(all_questions, difficulty, len(all_questions))
+    async def agenerate_stream(self, state: dict, input: str, num_questions: int, question_types: list, difficulty: str, use_cache: bool = True):
+        """
+        Async generate_stream of an AI quiz, for async Gradio handlers: waiting
+        on the LLM holds no worker thread
+        """
+        error = self._check_inputs('ai', input, question_types, difficulty)
+        if error:
+            yield self.show_error(state, error)
+            return
 
-            show_buttons = "0 questions" not in self.markdown_result
-            return (
-                gr.update(visible=show_buttons),
-                gr.update(visible=show_buttons),
-                gr.Markdown(self.markdown_result)
-            )
+        log = metrics.RequestLog("generate_stream", gen_type='ai', num_questions=num_questions)
+        try:
+            all_questions = []
+            async for all_questions in llm_client.iterate_on_loop(metrics.timed_iter(llm_client.agenerate_from_llm_stream(
+                source_text=input,
+                num_questions=num_questions,
+                question_types=question_types,
+                difficulty=difficulty,
+                use_cache=use_cache
+            ), log, 'llm')):
+                log.first_question()
+                yield (
+                    gr.update(visible=False),
+                    gr.update(visible=False),
+                    gr.Markdown(self.format_markdown(all_questions, difficulty, len(all_questions))),
+                    state
+                )
+            with metrics.attach(log):
+                quiz = self._quiz_state(state, input, all_questions, question_types, difficulty)
+            log.finish()
+            yield self._show_quiz(quiz)
         except Exception as e:
-            return (
-                gr.update(visible=False),
-                gr.update(visible=False),
-                f"**Error generating questions:** {e}"
-            )
+            log.finish('error')
+            yield self.show_error(state, f"**Error generating questions:** {e}")
 
-    def _generate_with_ai(self, input: str, num_questions: int, question_types: list, difficulty: str):
+    def _generate_with_ai(self, input: str, num_questions: int, question_types: list, difficulty: str, use_cache: bool = True):
         result = llm_client.generate_from_llm(
             source_text=input,
             num_questions=num_questions,
             question_types=question_types,
-            difficulty=difficulty
+            difficulty=difficulty,
+            use_cache=use_cache
         )
 
         return result
 
 
-    def _generate_from_text(self, input: str, num_questions: int, question_types: list):
+    def _generate_from_text(self, input: str, num_questions: int, question_types: list, analysis: DocumentAnalysis = None, progress=None):
+        analysis = analysis or DocumentAnalysis(input)
         questions_per_type = num_questions // len(question_types)
         remainder = num_questions % len(question_types)
 
-        all_questions = []
+        plan = []
         for i, q_type in enumerate(question_types):
             # Add extra question to first types if there's a remainder
             count = questions_per_type + (1 if i < remainder else 0)
-            
-            if count > 0:
-                if q_type == 'fill_blank':
-                    questions = q_types.generate_fill_blank_questions(input, count)
-                elif q_type == 'mcq':
-                    questions = q_types.generate_mcq_questions(input, count)
-                elif q_type == 't/f':
-                    questions = q_types.generate_true_false_questions(input, count)
-                elif q_type == "short_answer":
-                    questions = q_types.generate_short_answer_questions(input, count)
-                else:
-                    continue
-                
-                all_questions.extend(questions)
+            if count > 0 and q_type in _generators:
+                plan.append((q_type, count))
+
+        executor = get_generation_executor() if len(plan) > 1 else None
+        if executor is None:
+            results = []
+            for q_type, count in plan:
+                if progress:
+                    progress(q_type)
+                results.append(_generators[q_type](input, count, analysis))
+        else:
+            if progress:
+                # Every type runs at once, so they start together
+                for q_type, _ in plan:
+                    progress(q_type)
+
+            # Shared NLP work happens once here, before the types fan out
+            analysis.prepare()
+            if any(q_type == 'mcq' for q_type, _ in plan):
+                # Loaded before workers fork, so they map the same vectors
+                distractors.get_distractor_index()
+
+            futures = [executor.submit(_generators[q_type], input, count, analysis) for q_type, count in plan]
+            # Collected in submission order, so the quiz order doesn't depend on timing
+            results = [future.result() for future in futures]
+
+        all_questions = []
+        for questions in results:
+            all_questions.extend(questions)
+
         return all_questions
 
-    def shuffle(self):
-        if not self.current_quiz_state['questions']:
-            return (
-                gr.update(visible=False),
-                gr.update(visible=False),
-                "Please generate a quiz first before shuffling!"
-            )
-        
-        shuffled_questions = self.current_quiz_state['questions'].copy()
+    def shuffle(self, state: dict):
+        if not state['questions']:
+            return self.show_error(state, "Please generate a quiz first before shuffling!")
+
+        shuffled_questions = state['questions'].copy()
         random.shuffle(shuffled_questions)
-        
-        self.markdown_result = self.format_markdown(shuffled_questions, self.current_quiz_state['num_questions'])
 
-        show_buttons = "0 questions" not in self.markdown_result
-        return (
-            gr.update(visible=show_buttons),
-            gr.update(visible=show_buttons),
-            gr.Markdown(self.markdown_result)
-        )
+        # Downloads follow the shuffled order too
+        return self._show_quiz({
+            **state,
+            'questions': shuffled_questions,
+            'markdown_result': self.format_markdown(shuffled_questions, state['difficulty'], state['num_questions']),
+        })
     
     def format_markdown(self, questions: list, difficulty: str, num_questions: int):
         """Format given questions into markdown, as a string"""
@@ -217,6 +464,13 @@ class Quiz:
         return output
 
     def format_as_pdf(self, questions: list, filename: str):
+        # ReportLab is only needed for PDF exports, so import it on first use
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib.units import inch
+        from reportlab.lib.enums import TA_CENTER
+
         doc = SimpleDocTemplate(filename, pagesize=letter)
         story = []
         
@@ -344,107 +598,171 @@ class Quiz:
         
         return text
 
-    def download(self, file_type: str):
-        """Download quiz in the specified file format"""
-        questions = self.current_quiz_state['questions']
-        
-        if not questions:
-            return (
-                None,
-                gr.Markdown("No quiz to download. Please generate a quiz first.")
-            )
+    def export(self, questions: list, file_type: str, directory: str, markdown: str = None):
+        """Write questions to a quiz file of file_type in directory, returns its path"""
         file_type = "md" if file_type not in ["csv", "md", "pdf", "txt"] else file_type
-        filename = f"generated_quiz.{file_type}"
-        try:
+        filename = os.path.join(directory, f"generated_quiz.{file_type}")
+
+        with metrics.span(f"export.{file_type}"):
             if file_type == "csv":
                 content = self.format_as_csv(questions)
                 with open(filename, "w", encoding='utf-8', newline='') as f:
                     f.write(content)
-                    
+
             elif file_type == "txt":
                 content = self.format_as_txt(questions)
                 with open(filename, "w", encoding='utf-8') as f:
                     f.write(content)
-                    
+
             elif file_type == "pdf":
                 filename = self.format_as_pdf(questions, filename)
-                
+
             else:
-                content = self.markdown_result
+                content = markdown if markdown is not None else self.format_markdown(questions, None, len(questions))
                 with open(filename, "w", encoding='utf-8') as f:
                     f.write(content)
-            
+
+        return filename
+
+    def download(self, state: dict, file_type: str):
+        """Download quiz in the specified file format"""
+        questions = state['questions']
+        
+        if not questions:
+            return (
+                None,
+                gr.Markdown("No quiz to download. Please generate a quiz first."),
+                state
+            )
+
+        try:
+            # Every session writes to its own folder, so concurrent downloads don't collide
+            if not state.get('download_dir'):
+                state = {**state, 'download_dir': tempfile.mkdtemp(prefix="quiz_download_")}
+            with metrics.request("download", file_type=file_type):
+                if file_type == "pdf":
+                    # ReportLab layout is CPU-bound, so PDFs are built on the process pool
+                    filename = executors.run_cpu(self.export, questions, file_type, state['download_dir'], state['markdown_result'])
+                else:
+                    filename = self.export(questions, file_type, state['download_dir'], state['markdown_result'])
+
             return (
                 filename,
-                gr.Markdown(f"{self.markdown_result}\n\nQuiz downloaded as **{filename}**\n\n")
+                gr.Markdown(f"{state['markdown_result']}\n\nQuiz downloaded as **{os.path.basename(filename)}**\n\n"),
+                state
             )
             
         except Exception as e:
             return (
                 None,
-                gr.Markdown(f"Error downloading quiz: {str(e)}\n\n{self.markdown_result}")
+                gr.Markdown(f"Error downloading quiz: {str(e)}\n\n{state['markdown_result']}"),
+                state
             )
 
-    
-    def analyze(self):
+    def analysis_report(self, input: str, document: DocumentAnalysis = None):
+        """
+        Markdown analysis of input (key terms, entities, topics), reusing
+        document when it was built for the same text. Returns (document, markdown).
+        """
+        if document is None or document.text != input:
+            document = DocumentAnalysis(input)
+
         analysis = "\n---\n## Analysis\n\n"
     
-        keywords = algorithms.extract_keywords_tfidf(self.input_text, top_n=10)
+        keywords = document.keywords[:10]
         analysis += f"**Key Terms (TF-IDF):** {', '.join(keywords)}\n\n"
         
-        entities = algorithms.extract_entities_ner(self.input_text)
+        entities = document.entities
         if entities:
             analysis += f"**Named Entities (NER):** "
             entity_strs = [f"{e['text']} ({e['label']})" for e in entities[:10]]
             analysis += ', '.join(entity_strs) + "\n\n"
         
-        topics = algorithms.extract_topics_lda(self.input_text, n_topics=3)
+        topics = document.get_topics(n_topics=3)
         if topics:
-            analysis += "**Topics (LDA):**\n"
+            analysis += f"**Topics ({algorithms.TOPIC_BACKEND.upper()}):**\n"
             for i, topic in enumerate(topics, 1):
                 analysis += f"   Topic {i}: {', '.join(topic[:5])}\n"
 
-        self.markdown_result += analysis
+        return document, analysis
+
+    def analyze(self, state: dict):
+        # Reuse the artifacts built during generation (AI quizzes have none yet)
+        with metrics.request("analyze"):
+            document, analysis = self.analysis_report(state['input_text'], state['analysis'])
+        state = {**state, 'analysis': document, 'markdown_result': state['markdown_result'] + analysis}
 
         return (
             gr.update(visible=True),
             gr.update(visible=True),
-            gr.Markdown(self.markdown_result)
+            gr.Markdown(state['markdown_result']),
+            state
         )
 
-    def get_text_from_file(self, file_obj, gen_type: str, n, types, difficulty):
+    def read_upload(self, file_obj):
+        """Ingest an upload, returns (upload, None) or (None, error message)"""
         if file_obj is None:
-            return "⚠️ Please upload a .txt file."
-        text = None
+            return None, "⚠️ Please upload a .txt file."
         # Handle different possible types of file_obj
         try:
-            # If it's a file-like object (with read)
-            if hasattr(file_obj, "read"):
-                raw = file_obj.read()
-                if isinstance(raw, (bytes, bytearray)):
-                    text = raw.decode("utf-8", errors="ignore")
-                else:
-                    text = raw  # assume str
-            # If it's a str (filepath)
-            elif isinstance(file_obj, str):
-                with open(file_obj, "r", encoding="utf-8", errors="ignore") as f:
-                    text = f.read()
+            # File-like objects (with read) and filepaths are streamed in chunks
+            if hasattr(file_obj, "read") or isinstance(file_obj, str):
+                upload = ingestion.ingest(file_obj)
             else:
-                return f"❗ Unsupported upload type: {type(file_obj)}"
+                return None, f"❗ Unsupported upload type: {type(file_obj)}"
         except Exception as e:
-            return f"❗ Could not read file: {e}"
+            return None, f"❗ Could not read file: {e}"
+        text = upload['text']
         if not text or not text.strip():
-            return "⚠️ Uploaded file seems empty."
+            return None, "⚠️ Uploaded file seems empty."
+        return upload, None
+
+    def get_text_from_file(self, state: dict, file_obj, gen_type: str, n, types, difficulty, use_cache: bool = True):
+        upload, error = self.read_upload(file_obj)
+        if error:
+            return self.show_error(state, error)
 
         try:
             return self.generate(
+                state,
                 gen_type=gen_type,
-                input=text,
+                input=upload['text'],
                 num_questions=n,
                 question_types=types,
-                difficulty=difficulty
+                difficulty=difficulty,
+                sentences=upload['sentences'],
+                use_cache=use_cache
             )
            
         
         except Exception as e:
-            return f"**Error calling Groq API:** {e}"
+            return self.show_error(state, f"**Error calling Groq API:** {e}")
+
+    def get_text_from_file_stream(self, state: dict, file_obj, gen_type: str, n, types, difficulty, use_cache: bool = True):
+        """Generator version of get_text_from_file, see generate_stream"""
+        upload, error = self.read_upload(file_obj)
+        if error:
+            yield self.show_error(state, error)
+            return
+
+        yield from self.generate_stream(
+            state,
+            gen_type=gen_type,
+            input=upload['text'],
+            num_questions=n,
+            question_types=types,
+            difficulty=difficulty,
+            sentences=upload['sentences'],
+            use_cache=use_cache
+        )
+
+    async def aget_text_from_file_stream(self, state: dict, file_obj, n, types, difficulty, use_cache: bool = True):
+        """Async get_text_from_file_stream of an AI quiz, see agenerate_stream"""
+        # Reading and segmenting the upload blocks, so it happens on a thread
+        upload, error = await asyncio.to_thread(self.read_upload, file_obj)
+        if error:
+            yield self.show_error(state, error)
+            return
+
+        async for outputs in self.agenerate_stream(state, upload['text'], n, types, difficulty, use_cache):
+            yield outputs
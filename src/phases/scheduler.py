@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Provider limits the scheduler keeps LLM traffic under (0 disables a limit).
+# The defaults match Groq's free tier for llama-3.3-70b-versatile.
+LLM_RPM = float(os.getenv("QUIZ_LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("QUIZ_LLM_TPM", "12000"))
+
+# Requests allowed to wait for their turn, and how long each may wait (seconds)
+LLM_QUEUE_SIZE = int(os.getenv("QUIZ_LLM_QUEUE_SIZE", "256"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("QUIZ_LLM_QUEUE_TIMEOUT", "120"))
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Queue times kept for the percentiles in stats()
+QUEUE_TIME_WINDOW = 1000
+
+
+class SchedulerBusyError(RuntimeError):
+    """The request queue is full, or a request waited longer than its timeout"""
+
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second, up to one minute's worth"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self):
+        return self.per_minute <= 0
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # A request larger than the bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) * 60 / self.per_minute)
+
+    def take(self, amount: float, now: float):
+        if not self.unlimited:
+            self._refill(now)
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        """Adjust for the difference between an estimate and actual usage (may be negative)"""
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RequestScheduler:
+    """
+    Admits LLM requests under requests-per-minute and tokens-per-minute
+    token buckets. Waiting requests form a bounded priority queue and are
+    admitted strictly in (priority, arrival) order, so over-limit work waits
+    its turn instead of failing. A rate-limit response pauses admission for
+    everyone until the provider's Retry-After has passed.
+
+    Safe to use from any number of threads.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, max_queue: int = LLM_QUEUE_SIZE,
+                 timeout: float = LLM_QUEUE_TIMEOUT):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._queue = []  # (priority, arrival number)
+        self._arrivals = itertools.count()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._queue_times = deque(maxlen=QUEUE_TIME_WINDOW)
+        self._counters = {
+            'admitted': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'pauses': 0,
+            'queue_seconds': 0.0,
+        }
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_INTERACTIVE, timeout: float = None) -> float:
+        """
+        Block until a request estimated at tokens tokens may be sent.
+        Returns the seconds spent queued; raises SchedulerBusyError when the
+        queue is full or the wait exceeds timeout.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._counters['rejected'] += 1
+                raise SchedulerBusyError(f"LLM request queue is full ({self.max_queue} waiting)")
+
+            entry = (priority, next(self._arrivals))
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now - start > timeout:
+                        self._counters['timed_out'] += 1
+                        raise SchedulerBusyError(f"LLM request waited more than {timeout:.0f}s for its turn")
+
+                    remaining = timeout - (now - start)
+                    wait = remaining
+                    if self._queue[0] == entry:
+                        wait = max(
+                            self._paused_until - now,
+                            self.requests.wait_time(1, now),
+                            self.tokens.wait_time(tokens, now),
+                        )
+                        if wait <= 0:
+                            self.requests.take(1, now)
+                            self.tokens.take(tokens, now)
+                            break
+                    # Woken early when the queue head changes or a pause is set
+                    self._cond.wait(timeout=min(wait, remaining))
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+            queued = time.monotonic() - start
+            self._counters['admitted'] += 1
+            self._counters['queue_seconds'] += queued
+            self._queue_times.append(queued)
+        return queued
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once a response reports its real usage"""
+        with self._cond:
+            self.tokens.give_back(min(estimated_tokens, self.tokens.capacity) - actual_tokens)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Hold every queued request for seconds (after the provider answered 429)"""
+        with self._cond:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                self._counters['pauses'] += 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Admission counters, queue depth and queue-time percentiles"""
+        with self._cond:
+            stats = dict(self._counters)
+            stats['queued'] = len(self._queue)
+            queue_times = list(self._queue_times)
+        if queue_times:
+            p50, p95, p99 = np.percentile(queue_times, [50, 95, 99])
+            stats.update(queue_p50=float(p50), queue_p95=float(p95), queue_p99=float(p99), queue_max=max(queue_times))
+        return stats
@@ -0,0 +1,166 @@
+import importlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Load registered models in a background thread as soon as the app starts
+WARM_UP = os.getenv("QUIZ_WARM_UP", "1") != "0"
+
+_lock = threading.Lock()
+_timings = []   # (name, kind, seconds)
+_tasks = {}     # name -> loader
+_status = {}    # name -> 'pending' | 'loading' | 'ready' | 'failed'
+_errors = {}    # name -> error message
+_warm_up_thread = None
+
+
+def record(name: str, kind: str, seconds: float):
+    """Record the cost of one startup step (kind is 'import', 'model' or 'build')"""
+    with _lock:
+        _timings.append((name, kind, seconds))
+
+
+@contextmanager
+def timed(name: str, kind: str = "import"):
+    """Time the enclosed block and record it in the startup report"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, kind, time.perf_counter() - start)
+
+
+def lazy_import(module_name: str):
+    """Import a module on first use, recording its import cost"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    with timed(module_name, "import"):
+        return importlib.import_module(module_name)
+
+
+def report() -> str:
+    """Plain-text table of every recorded import and model load, slowest first"""
+    with _lock:
+        timings = sorted(_timings, key=lambda t: t[2], reverse=True)
+
+    if not timings:
+        return "Startup report: nothing recorded yet."
+
+    lines = ["Startup report:", f"  {'seconds':>8}  {'kind':<7} name"]
+    for name, kind, seconds in timings:
+        lines.append(f"  {seconds:8.3f}  {kind:<7} {name}")
+    lines.append(f"  {sum(t[2] for t in timings):8.3f}  total")
+    return "\n".join(lines)
+
+
+def register(name: str, loader):
+    """Register a model loader to run during background warm-up (and on first use)"""
+    with _lock:
+        _tasks[name] = loader
+        _status.setdefault(name, 'pending')
+
+
+def _run(name):
+    with _lock:
+        loader = _tasks[name]
+        _status[name] = 'loading'
+
+    try:
+        loader()
+    except Exception as e:
+        with _lock:
+            _status[name] = 'failed'
+            _errors[name] = str(e)
+        print(f"WARNING: Warm-up of {name} failed: {e}")
+        return
+
+    with _lock:
+        # The loader may have flagged itself as failed (e.g. a missing model)
+        if _status[name] == 'loading':
+            _status[name] = 'ready'
+
+
+def _warm_up_all():
+    with _lock:
+        names = [name for name, state in _status.items() if state == 'pending']
+    for name in names:
+        _run(name)
+    print(report())
+
+
+def start_warm_up():
+    """Load every registered model on a daemon thread, returns immediately"""
+    global _warm_up_thread
+
+    if not WARM_UP:
+        return
+    with _lock:
+        if _warm_up_thread is not None and _warm_up_thread.is_alive():
+            return
+        _warm_up_thread = threading.Thread(target=_warm_up_all, name="warm-up", daemon=True)
+    _warm_up_thread.start()
+
+
+def wait_for_warm_up(timeout: float = None):
+    """Block until the background warm-up (if running) has finished"""
+    with _lock:
+        thread = _warm_up_thread
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(timeout)
+
+
+def mark_ready(name: str):
+    """Mark a registered model as loaded when it was loaded on first use instead of by warm-up"""
+    with _lock:
+        if name in _status:
+            _status[name] = 'ready'
+
+
+def mark_failed(name: str, error: str):
+    """Mark a registered model as unavailable, with the reason shown in the UI"""
+    with _lock:
+        if name in _status:
+            _status[name] = 'failed'
+            _errors[name] = error
+
+
+def status() -> dict:
+    with _lock:
+        return dict(_status)
+
+
+def is_ready(name: str = None) -> bool:
+    """Whether one model (or every registered model) finished loading"""
+    with _lock:
+        if name is not None:
+            return _status.get(name) == 'ready'
+        return all(state == 'ready' for state in _status.values())
+
+
+def is_loading() -> bool:
+    """
+    Whether any registered model is still waiting to load or loading. With
+    warm-up disabled pending models only load on first use, so they are not
+    waited for.
+    """
+    waiting = ('pending', 'loading') if WARM_UP else ('loading',)
+    with _lock:
+        return any(state in waiting for state in _status.values())
+
+
+def readiness_markdown() -> str:
+    """Short Markdown summary of model readiness for the UI"""
+    icons = {'pending': '⏳', 'loading': '⏳', 'ready': '✅', 'failed': '❌'}
+    with _lock:
+        items = [
+            f"{icons.get(state, '')} {name}" + (f" ({_errors[name]})" if state == 'failed' else "")
+            for name, state in _status.items()
+        ]
+
+    if not items:
+        return ""
+    return "**Models:** " + " · ".join(items)
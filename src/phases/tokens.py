@@ -0,0 +1,116 @@
+import os
+import threading
+
+# Source tokens sent in one request, well below the context window so that
+# requests stay within the per-minute token limits of the Groq free tier
+SOURCE_TOKENS = int(os.getenv("QUIZ_LLM_SOURCE_TOKENS", "4000"))
+
+# Starting chars-per-token ratio of a model before any response calibrated it
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+# Weight of each new observation in the calibrated ratio
+CALIBRATION_SMOOTHING = 0.2
+
+# model -> (context window, max completion tokens)
+MODEL_LIMITS = {
+    "llama-3.3-70b-versatile": (131072, 32768),
+    "llama-3.1-8b-instant": (131072, 131072),
+}
+DEFAULT_MODEL_LIMITS = (8192, 4096)
+
+# Rough completion tokens of one question of each type, JSON included
+QUESTION_TOKENS = {
+    "fill_blank": 60,
+    "t/f": 50,
+    "short_answer": 70,
+    "mcq": 110,
+}
+
+# Tokens of the JSON object around the questions array
+RESPONSE_OVERHEAD_TOKENS = 40
+
+# Headroom on top of the completion estimate, so answers are not cut short
+COMPLETION_MARGIN = 1.25
+
+
+def model_limits(model: str):
+    return MODEL_LIMITS.get(model, DEFAULT_MODEL_LIMITS)
+
+
+def completion_budget(model: str, num_questions: int, question_types=None) -> int:
+    """max_tokens for a response holding num_questions questions of the given types"""
+    known = [t for t in (question_types or []) if t in QUESTION_TOKENS]
+    per_question = (
+        sum(QUESTION_TOKENS[t] for t in known) / len(known) if known
+        else max(QUESTION_TOKENS.values())
+    )
+    budget = int((RESPONSE_OVERHEAD_TOKENS + num_questions * per_question) * COMPLETION_MARGIN)
+    return min(budget, model_limits(model)[1])
+
+
+class TokenEstimator:
+    """
+    Estimates token counts from character counts, with a chars-per-token
+    ratio per model calibrated from the prompt token counts the API reports.
+    """
+
+    def __init__(self, chars_per_token: float = DEFAULT_CHARS_PER_TOKEN, smoothing: float = CALIBRATION_SMOOTHING):
+        self.default_ratio = chars_per_token
+        self.smoothing = smoothing
+        self._ratios = {}
+        self._lock = threading.Lock()
+
+    def ratio(self, model: str) -> float:
+        with self._lock:
+            return self._ratios.get(model, self.default_ratio)
+
+    def count(self, text: str, model: str) -> int:
+        return int(len(text) / self.ratio(model)) + 1
+
+    def count_messages(self, messages, model: str) -> int:
+        # A few tokens per message for the chat template
+        return sum(self.count(m["content"], model) + 4 for m in messages)
+
+    def chars_for(self, tokens: int, model: str) -> int:
+        """Characters that fit in a budget of tokens"""
+        return max(0, int(tokens * self.ratio(model)))
+
+    def observe(self, model: str, chars: int, tokens: int):
+        """Update the ratio of model from a prompt of chars characters that used tokens tokens"""
+        if chars <= 0 or tokens <= 0:
+            return
+        observed = chars / tokens
+        with self._lock:
+            current = self._ratios.get(model)
+            self._ratios[model] = observed if current is None else (
+                (1 - self.smoothing) * current + self.smoothing * observed
+            )
+
+
+class UsageStats:
+    """Token usage of every LLM request, and how many were cut off by max_tokens"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            'requests': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'truncated': 0,
+        }
+
+    def record(self, prompt_tokens: int, completion_tokens: int, truncated: bool):
+        with self._lock:
+            self._counters['requests'] += 1
+            self._counters['prompt_tokens'] += prompt_tokens
+            self._counters['completion_tokens'] += completion_tokens
+            self._counters['truncated'] += int(truncated)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+
+# Process-wide instances shared by every request
+estimator = TokenEstimator()
+usage = UsageStats()
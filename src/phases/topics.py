@@ -0,0 +1,144 @@
+import os
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from .algorithms import TOPIC_BACKEND, top_k_indices
+from .startup import lazy_import
+
+# Hashed vocabulary size of incremental topic models. Hashing keeps the
+# feature space fixed, so new words in later documents need no refit.
+TOPIC_HASH_FEATURES = int(os.getenv("QUIZ_TOPIC_HASH_FEATURES", str(2 ** 16)))
+
+# Topics of the model shared by per-text analyses (see get_topic_model)
+TOPIC_MODEL_TOPICS = int(os.getenv("QUIZ_TOPIC_MODEL_TOPICS", "10"))
+
+# Terms remembered per hashed column to name topics; only the most frequent
+# ones are kept, so the names take bounded memory however many documents arrive
+TOPIC_COLUMN_TERMS = 8
+
+
+class TopicModel:
+    """
+    Topic model for a growing corpus, updated with partial_fit as documents
+    arrive instead of being refit from scratch.
+
+    backend='lda' uses online LatentDirichletAllocation on term counts,
+    backend='nmf' uses the faster MiniBatchNMF on l2-normalized counts.
+    """
+
+    def __init__(self, n_topics: int = 5, backend: str = None, n_features: int = TOPIC_HASH_FEATURES):
+        self.n_topics = n_topics
+        self.backend = backend or TOPIC_BACKEND
+        self.n_documents = 0
+        self._lock = threading.Lock()
+
+        text = lazy_import("sklearn.feature_extraction.text")
+        decomposition = lazy_import("sklearn.decomposition")
+
+        self.vectorizer = text.HashingVectorizer(
+            n_features=n_features,
+            stop_words='english',
+            alternate_sign=False,
+            norm='l2' if self.backend == 'nmf' else None,
+        )
+        if self.backend == 'nmf':
+            self.model = decomposition.MiniBatchNMF(n_components=n_topics, random_state=42)
+        elif self.backend == 'lda':
+            self.model = decomposition.LatentDirichletAllocation(
+                n_components=n_topics, learning_method='online', random_state=42
+            )
+        else:
+            raise ValueError(f"Unknown topic backend '{self.backend}', expected 'lda' or 'nmf'.")
+
+        # Hashed column -> counts of the terms that landed in it, to name topics
+        self._column_terms = defaultdict(Counter)
+        self._analyzer = self.vectorizer.build_analyzer()
+
+    def partial_fit(self, documents):
+        """Update the model with new documents (e.g. the sentences of an upload)"""
+        documents = [d for d in documents if d and d.strip()]
+        if not documents:
+            return self
+
+        X = self.vectorizer.transform(documents)
+
+        term_counts = Counter()
+        for document in documents:
+            term_counts.update(self._analyzer(document))
+        terms = list(term_counts)
+        term_columns = self.vectorizer.transform(terms) if terms else None
+
+        with self._lock:
+            self.model.partial_fit(X)
+            self.n_documents += len(documents)
+
+            if term_columns is not None:
+                for row, term in enumerate(terms):
+                    for column in term_columns.indices[term_columns.indptr[row]:term_columns.indptr[row + 1]]:
+                        counts = self._column_terms[column]
+                        counts[term] += term_counts[term]
+                        if len(counts) > 2 * TOPIC_COLUMN_TERMS:
+                            self._column_terms[column] = Counter(dict(counts.most_common(TOPIC_COLUMN_TERMS)))
+        return self
+
+    @property
+    def is_fitted(self):
+        return self.n_documents > 0
+
+    def topics(self, n_words: int = 5):
+        """Top words of every topic, from the current model (no refitting)"""
+        with self._lock:
+            if not self.is_fitted:
+                return []
+            columns = np.fromiter(self._column_terms.keys(), dtype=int)
+            names = [self._column_terms[c].most_common(1)[0][0] for c in columns]
+            components = np.asarray(self.model.components_)[:, columns]
+
+        topics = []
+        for topic in components:
+            topics.append([names[i] for i in top_k_indices(topic, n_words)])
+        return topics
+
+    def text_topics(self, documents, n_topics: int = 3, n_words: int = 5):
+        """
+        Topics of one text (e.g. its sentences): the model learns the text with
+        partial_fit, then the text's n_topics strongest topics are named by
+        the text's own terms that weigh most in them
+        """
+        documents = [d for d in documents if d and d.strip()]
+        if len(documents) < 2:
+            return []
+
+        self.partial_fit(documents)
+        X = self.vectorizer.transform(documents)
+        terms = list(dict.fromkeys(term for document in documents for term in self._analyzer(document)))
+        if not terms:
+            return []
+        # Every term hashes to exactly one column
+        columns = self.vectorizer.transform(terms).indices
+
+        with self._lock:
+            weights = np.asarray(self.model.transform(X)).sum(axis=0)
+            components = np.asarray(self.model.components_)[:, columns]
+
+        return [[terms[i] for i in top_k_indices(components[topic], n_words)]
+                for topic in top_k_indices(weights, n_topics)]
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_topic_model() -> TopicModel:
+    """
+    Process-wide topic model that every analyzed text updates and is read
+    from, so topic queries never fit a model from scratch
+    """
+    global _model
+
+    with _model_lock:
+        if _model is None:
+            _model = TopicModel(n_topics=TOPIC_MODEL_TOPICS)
+        return _model
@@ -0,0 +1,63 @@
+"""
+Serves the Gradio app together with the JSON API (see api.py) and a
+Prometheus /metrics endpoint:
+
+    cd src
+    python server.py
+    uvicorn server:app --host 0.0.0.0 --port 7860
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import gradio as gr
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+import api
+from app import demo
+from phases import jobs, llm_client, metrics, tokens
+from phases.cache import analysis_cache
+
+# Address the server listens on
+HOST = os.getenv("QUIZ_HOST", "127.0.0.1")
+PORT = int(os.getenv("QUIZ_PORT", "7860"))
+
+# Counters and gauges of the shared caches, the LLM scheduler and token usage.
+# The analysis cache's counters include the lookups made in CPU pool workers.
+metrics.registry.register_collector(metrics.stats_collector(
+    "quiz_analysis_cache", "Document analysis cache", analysis_cache.stats,
+    counters=['hits', 'disk_hits', 'misses', 'evictions']))
+metrics.registry.register_collector(metrics.stats_collector(
+    "quiz_llm_cache", "LLM response cache", llm_client.response_cache.stats,
+    counters=['hits', 'misses', 'evictions']))
+metrics.registry.register_collector(metrics.stats_collector(
+    "quiz_llm_scheduler", "LLM request scheduler", llm_client.scheduler.stats,
+    counters=['admitted', 'rejected', 'timed_out', 'pauses', 'queue_seconds']))
+metrics.registry.register_collector(metrics.stats_collector(
+    "quiz_llm_usage", "LLM token usage", tokens.usage.stats,
+    counters=['requests', 'prompt_tokens', 'completion_tokens', 'truncated']))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background jobs interrupted by the last shutdown are run again
+    await asyncio.to_thread(jobs.job_queue.resume)
+    yield
+
+
+app = FastAPI(title="Automatic Quiz Generator", lifespan=lifespan)
+app.include_router(api.router)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+# Mounted last so /api and /metrics aren't routed to the UI
+app = gr.mount_gradio_app(app, demo, path="/", theme=gr.themes.Soft())
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=HOST, port=PORT)
@@ -0,0 +1,16 @@
+import os
+
+# Set before the phases modules read their settings: offline LLM backend
+# without latency or rate limits, nothing cached on disk, no background
+# warm-up and no worker processes.
+os.environ.setdefault("QUIZ_LLM_BACKEND", "fake")
+os.environ.setdefault("QUIZ_LLM_FAKE_LATENCY", "0")
+os.environ.setdefault("QUIZ_LLM_FAKE_JITTER", "0")
+os.environ.setdefault("QUIZ_LLM_CACHE_PATH", ":memory:")
+os.environ.setdefault("QUIZ_LLM_RPM", "0")
+os.environ.setdefault("QUIZ_LLM_TPM", "0")
+os.environ.setdefault("QUIZ_CACHE_DIR", "")
+os.environ.setdefault("QUIZ_JOBS_PATH", ":memory:")
+os.environ.setdefault("QUIZ_WARM_UP", "0")
+os.environ.setdefault("QUIZ_CPU_WORKERS", "0")
+os.environ.setdefault("QUIZ_REQUEST_LOG", "0")
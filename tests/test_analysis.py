@@ -0,0 +1,39 @@
+from phases.analysis import SentenceIndex
+
+SENTENCES = [
+    "Python was created by Guido van Rossum.",
+    "Pythonic code reads like plain English.",
+    "Many teams use python for data science.",
+    "Guido van Rossum led the project for decades.",
+]
+
+
+def test_lookup_matches_whole_words_ignoring_case():
+    index = SentenceIndex(SENTENCES)
+
+    assert index.lookup("python") == [0, 2]
+    assert index.lookup("PYTHON") == [0, 2]
+    assert index.lookup("Pythonic") == [1]
+    assert index.lookup("Rust") == []
+
+
+def test_lookup_of_a_phrase_needs_the_words_in_order():
+    index = SentenceIndex(SENTENCES)
+
+    assert index.lookup("Guido van Rossum") == [0, 3]
+    assert index.lookup("Rossum van Guido") == []
+
+
+def test_match_case_requires_the_exact_case():
+    index = SentenceIndex(SENTENCES)
+
+    assert index.lookup("Python", match_case=True) == [0]
+    assert index.lookup("python", match_case=True) == [2]
+
+
+def test_first_skips_used_sentences():
+    index = SentenceIndex(SENTENCES)
+
+    assert index.first("python") == 0
+    assert index.first("python", skip={0}) == 2
+    assert index.first("python", skip={0, 2}) is None
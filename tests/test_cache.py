@@ -0,0 +1,83 @@
+import os
+
+from phases import cache
+from phases.cache import AnalysisCache
+
+
+def test_entries_computed_in_a_worker_seed_another_cache():
+    worker = AnalysisCache(disk_dir="")
+    server = AnalysisCache(disk_dir="")
+    worker.capture()
+
+    assert worker.get_or_compute("keywords", lambda: ["python", "language"]) == ["python", "language"]
+    assert worker.get_or_compute("keywords", lambda: ["recomputed"]) == ["python", "language"]
+    entries = worker.drain()
+    assert [key for key, _, _ in entries] == ["keywords"]
+    assert worker.drain() == []
+
+    server.seed(entries)
+    assert server.get_or_compute("keywords", lambda: ["recomputed"]) == ["python", "language"]
+    assert server.stats()['hits'] == 1
+
+
+def test_resize_evicts_least_recently_used():
+    cache = AnalysisCache(disk_dir="")
+    for key in ["a", "b", "c"]:
+        cache.get_or_compute(key, lambda: "x" * 100)
+    cache.get_or_compute("a", lambda: None)
+
+    cache.resize(cache.stats()['bytes'] * 2 // 3)
+
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+    # "b" was the least recently used, so it is computed again
+    assert cache.get_or_compute("b", lambda: "new") == "new"
+
+
+def test_lookups_in_a_worker_are_counted_by_the_server():
+    worker = AnalysisCache(disk_dir="")
+    server = AnalysisCache(disk_dir="")
+    worker.get_or_compute("before", lambda: 1)
+    worker.capture()
+
+    worker.get_or_compute("topics", lambda: 1)
+    worker.get_or_compute("topics", lambda: 1)
+    server.add_counters(worker.drain_counters())
+    worker.get_or_compute("topics", lambda: 1)
+    server.add_counters(worker.drain_counters())
+
+    stats = server.stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+
+
+def _disk_files(directory):
+    return sorted(path.name for path in directory.rglob("*.pkl"))
+
+
+def test_disk_writes_walk_the_tier_only_when_needed(tmp_path, monkeypatch):
+    walks = []
+    walk = cache.os.walk
+    monkeypatch.setattr(cache.os, "walk", lambda top: walks.append(top) or walk(top))
+    disk = AnalysisCache(disk_dir=str(tmp_path), disk_max_bytes=10_000)
+
+    for key in ["a", "b", "c", "d"]:
+        disk.get_or_compute(key, lambda: "x" * 100)
+
+    # Scanned on the first write only, the rest are counted as they are written
+    assert len(walks) == 1
+    assert disk._disk_bytes == sum(path.stat().st_size for path in tmp_path.rglob("*.pkl"))
+
+
+def test_disk_tier_over_budget_drops_least_recently_used(tmp_path):
+    disk = AnalysisCache(disk_dir=str(tmp_path))
+    for n, key in enumerate(["a0", "b0"]):
+        disk.get_or_compute(key, lambda: "x" * 100)
+        os.utime(disk._disk_path(key), (n, n))
+    size = disk._disk_bytes // 2
+
+    disk.disk_max_bytes = size * 2
+    disk.get_or_compute("c0", lambda: "x" * 100)
+
+    assert _disk_files(tmp_path) == ["b0.pkl", "c0.pkl"]
+    assert disk._disk_bytes == size * 2
@@ -0,0 +1,52 @@
+import io
+import sys
+
+import pytest
+
+from phases import ingestion, preprocessing
+
+
+def test_sentences_split_across_chunks_are_rejoined():
+    text = " ".join(f"Sentence number {n} ends here." for n in range(200))
+
+    result = ingestion.ingest(io.StringIO(text), chunk_bytes=37)
+
+    assert result['text'] == text
+    assert result['sentences'] == preprocessing.preprocess_text(text)
+    assert not result['truncated']
+
+
+def test_text_without_boundaries_is_segmented_once(monkeypatch):
+    segmented = []
+    preprocess_text = preprocessing.preprocess_text
+
+    def counting(text):
+        segmented.append(len(text))
+        return preprocess_text(text)
+
+    monkeypatch.setattr(preprocessing, "preprocess_text", counting)
+    text = "word " * 20_000
+
+    result = ingestion.ingest(io.StringIO(text), chunk_bytes=1000)
+
+    assert result['text'] == text
+    # Each chunk only re-segments a bounded amount of text already seen
+    chunks = len(text) // 1000
+    assert sum(segmented) <= len(text) * 2 + chunks * ingestion.BOUNDARY_CONTEXT_CHARS
+
+
+def test_peak_memory_counts_sentences():
+    text = " ".join(f"Sentence number {n} ends here." for n in range(200))
+
+    result = ingestion.ingest(io.StringIO(text), chunk_bytes=1000)
+
+    sentence_bytes = sys.getsizeof(result['sentences']) + sum(map(sys.getsizeof, result['sentences']))
+    assert result['peak_memory_bytes'] > sys.getsizeof(text) + sentence_bytes - 2000
+
+
+def test_memory_limit_includes_sentences():
+    text = " ".join(f"Sentence number {n} ends here." for n in range(200))
+    text_only = sys.getsizeof(text) + 2000
+
+    with pytest.raises(ingestion.IngestLimitError):
+        ingestion.ingest(io.StringIO(text), max_memory_bytes=text_only, chunk_bytes=1000)
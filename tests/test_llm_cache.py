@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+from phases import llm_cache
+from phases.llm_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(path=":memory:", ttl=60)
+    cache.put("key", "model", "response")
+
+    clock[0] += 59
+    assert cache.get("key") == "response"
+
+    clock[0] += 2
+    assert cache.get("key") is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = ResponseCache(path=":memory:", ttl=3600, max_bytes=25)
+    cache.put("a", "model", "x" * 10)
+    clock[0] += 1
+    cache.put("b", "model", "y" * 10)
+    clock[0] += 1
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == "x" * 10
+    clock[0] += 1
+
+    cache.put("c", "model", "z" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.get("c") == "z" * 10
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['entries'] == 2
+    assert stats['bytes'] == 20
+
+
+def test_responses_larger_than_the_cache_are_not_stored(clock):
+    cache = ResponseCache(path=":memory:", max_bytes=5)
+    cache.put("key", "model", "too large")
+
+    assert cache.get("key") is None
@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+
+from phases import llm_client
+from phases.llm_backends import Completion
+from phases.llm_client import QuestionStreamParser, _parse_questions
+
+QUESTIONS = [
+    {"question": "Who created Python?", "answer": "Guido van Rossum", "type": "short_answer"},
+    {"question": "Python was first released in ____.", "answer": "1991", "type": "fill_blank"},
+    {"question": "Python emphasizes {readability}.", "answer": "True", "type": "t/f"},
+]
+
+
+def _feed_in_pieces(text, size):
+    parser = QuestionStreamParser()
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return parser, completed
+
+
+def test_stream_parser_handles_any_split():
+    text = json.dumps({"questions": QUESTIONS})
+    for size in (1, 2, 7, 64, len(text)):
+        _, completed = _feed_in_pieces(text, size)
+        assert [q["question"] for q in completed] == [q["question"] for q in QUESTIONS]
+
+
+def test_stream_parser_returns_each_question_once_it_closes():
+    text = json.dumps(QUESTIONS)
+    first_end = text.index("}") + 1
+    parser = QuestionStreamParser()
+
+    assert parser.feed(text[:first_end - 1]) == []
+    assert [q["answer"] for q in parser.feed(text[first_end - 1:first_end])] == ["Guido van Rossum"]
+    assert len(parser.feed(text[first_end:])) == 2
+
+
+def test_stream_parser_reads_fenced_response_with_prose():
+    text = "Here is your quiz:\n```json\n" + json.dumps({"questions": QUESTIONS}, indent=2) + "\n```\nGood luck!"
+    parser, completed = _feed_in_pieces(text, 5)
+
+    assert len(completed) == 3
+    # The whole response isn't JSON, which is why the parsed pieces are kept
+    assert _parse_questions(parser.buffer) == []
+
+
+def test_stream_parser_skips_malformed_questions():
+    text = json.dumps([{"question": "No answer", "type": "mcq"}, QUESTIONS[0]])
+    _, completed = _feed_in_pieces(text, 3)
+    assert [q["question"] for q in completed] == ["Who created Python?"]
+
+
+class _ProseStreamBackend:
+    """Streams fenced prose (as models do outside JSON mode) and completes with plain JSON"""
+
+    name = "prose"
+
+    async def complete(self, messages, model, temperature, max_tokens):
+        return Completion(content=json.dumps(QUESTIONS), finish_reason="stop", prompt_tokens=10, completion_tokens=10)
+
+    async def stream(self, messages, model, temperature, max_tokens):
+        content = "Sure!\n```json\n" + json.dumps(QUESTIONS) + "\n```"
+        return self._pieces(content)
+
+    @staticmethod
+    async def _pieces(content):
+        yield Completion(content=content, finish_reason="stop", prompt_tokens=10, completion_tokens=10)
+
+
+def test_streamed_response_is_not_served_to_json_mode(monkeypatch):
+    monkeypatch.setattr(llm_client, "get_backend", lambda: _ProseStreamBackend())
+    messages = [{"role": "user", "content": "stream/json cache separation test"}]
+
+    streamed = "".join(llm_client.stream_chat_completion(messages, model="test-model"))
+    assert streamed.startswith("Sure!")
+
+    content = llm_client.chat_completion(messages, model="test-model")
+    assert len(_parse_questions(content)) == 3
+
+    # Each mode is still answered from its own cache entry
+    assert "".join(llm_client.stream_chat_completion(messages, model="test-model")) == streamed
+    assert llm_client.chat_completion(messages, model="test-model") == content
+
+
+def test_unknown_long_document_mode_fails_at_import():
+    env = {**os.environ, "QUIZ_LLM_LONG_DOCUMENT_MODE": "mapreduce"}
+    result = subprocess.run([sys.executable, "-c", "import phases.llm_client"], env=env,
+                            cwd=os.path.join(os.path.dirname(__file__), "..", "src"), capture_output=True, text=True)
+
+    assert result.returncode != 0
+    assert "Unknown long document mode 'mapreduce'" in result.stderr
@@ -0,0 +1,11 @@
+import pytest
+
+from phases import quiz_generator
+from phases.quiz_generator import QuizAI
+
+
+def test_unknown_runtime_is_rejected_before_loading(monkeypatch):
+    monkeypatch.setattr(quiz_generator, "lazy_import", lambda name: pytest.fail(f"imported {name}"))
+
+    with pytest.raises(ValueError, match="Unknown T5 runtime 'fp16'"):
+        QuizAI(runtime="fp16")
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+import pytest
+
+from phases import executors, quizzes
+from phases.quizzes import Quiz, new_quiz_state
+
+SOURCE = (
+    "Python is a high-level programming language created by Guido van Rossum. "
+    "It was first released in 1991 and emphasizes code readability. "
+    "Python supports multiple programming paradigms including procedural and object-oriented programming. "
+    "The language has a large standard library that covers many common tasks. "
+)
+
+
+async def _collect(agen):
+    return [outputs async for outputs in agen]
+
+
+def test_async_upload_generates_ai_quiz(tmp_path):
+    upload = tmp_path / "notes.txt"
+    upload.write_text(SOURCE, encoding="utf-8")
+
+    outputs = asyncio.run(_collect(Quiz().aget_text_from_file_stream(
+        new_quiz_state(), str(upload), 3, ["mcq", "t/f"], "medium", use_cache=False)))
+
+    state = outputs[-1][-1]
+    assert state['input_text'].strip() == SOURCE.strip()
+    assert state['num_questions'] > 0
+    assert not str(outputs[-1][2]).startswith("**Error")
+
+
+def test_async_upload_without_file_shows_error():
+    state = new_quiz_state()
+    outputs = asyncio.run(_collect(Quiz().aget_text_from_file_stream(state, None, 3, ["mcq"], "medium")))
+
+    assert len(outputs) == 1
+    assert "upload" in outputs[0][2]
+    assert outputs[0][-1] is state
+
+
+def _generate_named_by_thread(text, count, analysis):
+    return [{'question': threading.current_thread().name, 'type': 'fill_blank'}] * count
+
+
+class _PreparedAnalysis:
+    def prepare(self):
+        return self
+
+
+def _generate_in_worker():
+    questions = Quiz()._generate_from_text("text", 2, ['fill_blank', 't/f'], _PreparedAnalysis())
+    return executors.in_cpu_worker(), [q['question'] for q in questions]
+
+
+@pytest.fixture
+def cpu_pool(monkeypatch):
+    monkeypatch.setattr(executors, "CPU_WORKERS", 1)
+    yield
+    if executors._pool is not None:
+        executors._pool.shutdown()
+        executors._pool = None
+
+
+@pytest.mark.parametrize("mode", ['thread', 'process'])
+def test_question_types_fan_out_inside_the_cpu_worker(monkeypatch, cpu_pool, mode):
+    monkeypatch.setattr(quizzes, "GENERATION_EXECUTOR", mode)
+    monkeypatch.setitem(quizzes._generators, 'fill_blank', _generate_named_by_thread)
+    monkeypatch.setitem(quizzes._generators, 't/f', _generate_named_by_thread)
+
+    in_worker, threads = executors.run_cpu(_generate_in_worker)
+
+    assert in_worker
+    assert all(name.startswith("quiz-gen") for name in threads)
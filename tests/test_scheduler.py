@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from phases.scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, RequestScheduler, SchedulerBusyError
+
+
+def _wait_until_queued(scheduler, n):
+    deadline = time.monotonic() + 5
+    while scheduler.stats()['queued'] < n:
+        assert time.monotonic() < deadline, "requests never queued"
+        time.sleep(0.005)
+
+
+def test_requests_are_admitted_by_priority_then_arrival():
+    scheduler = RequestScheduler(rpm=0, tpm=0)
+    scheduler.pause(0.5)
+    admitted = []
+
+    def request(name, priority):
+        scheduler.acquire(10, priority=priority)
+        admitted.append(name)
+
+    threads = []
+    for name, priority in [("batch 1", PRIORITY_BATCH), ("batch 2", PRIORITY_BATCH),
+                           ("interactive", PRIORITY_INTERACTIVE)]:
+        thread = threading.Thread(target=request, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        _wait_until_queued(scheduler, len(threads))
+
+    for thread in threads:
+        thread.join(5)
+
+    assert admitted == ["interactive", "batch 1", "batch 2"]
+    assert scheduler.stats()['admitted'] == 3
+
+
+def test_full_queue_rejects_new_requests():
+    scheduler = RequestScheduler(rpm=0, tpm=0, max_queue=1)
+    scheduler.pause(0.3)
+    waiting = threading.Thread(target=scheduler.acquire, args=(10,))
+    waiting.start()
+    _wait_until_queued(scheduler, 1)
+
+    with pytest.raises(SchedulerBusyError, match="queue is full"):
+        scheduler.acquire(10)
+
+    waiting.join(5)
+    stats = scheduler.stats()
+    assert stats['rejected'] == 1
+    assert stats['admitted'] == 1
+
+
+def test_request_waiting_past_its_timeout_is_rejected():
+    scheduler = RequestScheduler(rpm=0, tpm=0)
+    scheduler.pause(5)
+
+    with pytest.raises(SchedulerBusyError, match="waited more than"):
+        scheduler.acquire(10, timeout=0.05)
+
+    assert scheduler.stats()['timed_out'] == 1
+    assert scheduler.stats()['queued'] == 0
@@ -0,0 +1,18 @@
+import importlib
+
+from fastapi.testclient import TestClient
+
+from phases import jobs
+
+
+def test_interrupted_jobs_resume_when_the_server_starts(monkeypatch):
+    resumed = []
+    monkeypatch.setattr(jobs.job_queue, "resume", lambda: resumed.append(True))
+
+    server = importlib.import_module("server")
+    # Importing the app must not touch the job store
+    assert resumed == []
+
+    with TestClient(server.app) as client:
+        assert client.get("/metrics").status_code == 200
+    assert resumed == [True]
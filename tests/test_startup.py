@@ -0,0 +1,11 @@
+from phases import startup
+
+
+def test_pending_models_are_not_loading_without_warm_up(monkeypatch):
+    monkeypatch.setattr(startup, "_status", {"model": "pending"})
+
+    monkeypatch.setattr(startup, "WARM_UP", False)
+    assert not startup.is_loading()
+
+    monkeypatch.setattr(startup, "WARM_UP", True)
+    assert startup.is_loading()
@@ -0,0 +1,43 @@
+import pytest
+
+from phases import topics
+from phases.topics import TopicModel
+
+SENTENCES = [
+    "Python is a programming language with a large standard library.",
+    "The Python interpreter runs programs written in the language.",
+    "Volcanoes erupt lava and ash when magma rises to the surface.",
+    "Magma cools into igneous rock after a volcano erupts.",
+]
+
+
+def test_unknown_topic_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown topic backend 'bogus'"):
+        TopicModel(backend="bogus")
+
+
+@pytest.mark.parametrize("backend", ['lda', 'nmf'])
+def test_text_topics_are_named_by_the_texts_own_terms(backend):
+    model = TopicModel(n_topics=4, backend=backend)
+
+    text_topics = model.text_topics(SENTENCES, n_topics=2, n_words=3)
+
+    assert len(text_topics) == 2
+    words = {word for topic in SENTENCES for word in topic.lower().replace(".", "").split()}
+    assert all(len(topic) == 3 and set(topic) <= words for topic in text_topics)
+    assert model.n_documents == len(SENTENCES)
+
+    # Later texts update the same model instead of fitting a new one
+    model.text_topics(SENTENCES[:2], n_topics=1)
+    assert model.n_documents == len(SENTENCES) + 2
+
+
+def test_terms_naming_a_column_are_capped(monkeypatch):
+    monkeypatch.setattr(topics, "TOPIC_COLUMN_TERMS", 2)
+    # Every term lands in the same column
+    model = TopicModel(n_topics=2, n_features=1)
+
+    model.partial_fit([f"alpha beta gamma delta epsilon word{n}" for n in range(20)])
+
+    assert len(model._column_terms) == 1
+    assert len(model._column_terms[0]) <= 2 * topics.TOPIC_COLUMN_TERMS